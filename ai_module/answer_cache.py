@@ -0,0 +1,90 @@
+"""
+Cache de respostas do chatbot para perguntas repetidas.
+
+A chave é o texto da pergunta normalizado (sem acentos, maiúsculas e
+pontuação: "O que é variável?" e "o que e variavel" são a mesma pergunta),
+mais um contexto opcional (ex.: turma). Só deve ser consultado em perguntas
+sem histórico, pois a resposta de uma conversa depende das trocas anteriores.
+
+Entradas expiram após CHAT_IA_CACHE_TTL segundos e, acima de
+CHAT_IA_CACHE_TAMANHO entradas, a menos usada recentemente é descartada.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from functions import utils
+
+TAMANHO = int(os.getenv("CHAT_IA_CACHE_TAMANHO", "500"))
+TTL = int(os.getenv("CHAT_IA_CACHE_TTL", "3600"))
+
+
+class CacheRespostas:
+    def __init__(self, tamanho=TAMANHO, ttl=TTL, relogio=time.monotonic):
+        self.tamanho = tamanho
+        self.ttl = ttl
+        self._relogio = relogio
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "expiradas": 0, "descartadas": 0}
+
+    @staticmethod
+    def chave(pergunta, contexto=None):
+        """Chave normalizada da pergunta (None se não houver palavras)."""
+        texto = " ".join(utils.tokenizar(pergunta))
+        if not texto:
+            return None
+        return f"{contexto or ''}\x00{texto}"
+
+    def get(self, pergunta, contexto=None):
+        """Retorna a resposta guardada para a pergunta, ou None."""
+        chave = self.chave(pergunta, contexto)
+        if chave is None or self.tamanho <= 0:
+            return None
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is not None and entrada[0] <= self._relogio():
+                del self._entradas[chave]
+                self._stats["expiradas"] += 1
+                entrada = None
+            if entrada is None:
+                self._stats["misses"] += 1
+                return None
+            self._entradas.move_to_end(chave)
+            self._stats["hits"] += 1
+            return entrada[1]
+
+    def put(self, pergunta, resposta, contexto=None):
+        """Guarda a resposta, descartando as entradas menos usadas se preciso."""
+        chave = self.chave(pergunta, contexto)
+        if chave is None or self.tamanho <= 0 or not resposta:
+            return
+        with self._lock:
+            self._entradas[chave] = (self._relogio() + self.ttl, resposta)
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.tamanho:
+                self._entradas.popitem(last=False)
+                self._stats["descartadas"] += 1
+
+    def limpar(self):
+        """Remove todas as respostas guardadas (as estatísticas são mantidas)."""
+        with self._lock:
+            self._entradas.clear()
+
+    def stats(self):
+        """Retorna hits, misses, taxa de acerto, entradas expiradas/descartadas e tamanho."""
+        with self._lock:
+            consultas = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "taxa_acerto": round(self._stats["hits"] / consultas, 4) if consultas else 0.0,
+                "entradas": len(self._entradas),
+                "tamanho_maximo": self.tamanho,
+                "ttl": self.ttl,
+            }
+
+
+# Instância usada pelas rotas do chatbot (ai_routes.py)
+cache = CacheRespostas()
@@ -0,0 +1,129 @@
+"""
+Geração em lote das recomendações de estudo.
+
+As recomendações de cada aluno (recomendar_materiais + recomendar_estudo) são
+calculadas fora da requisição e gravadas em data/recomendacoes.json; a rota
+/recomendacoes apenas lê esse arquivo. Quando notas, materiais, diário ou
+matrículas mudam, as rotas descartam as recomendações dos alunos afetados
+(utils.invalidar_recomendacoes) e elas são recalculadas no próximo acesso.
+
+Uso (a partir da raiz do projeto, de preferência fora do horário de aulas):
+    python -m ai_module.batch_recommendation [--processos N] [--lote N]
+"""
+
+import argparse
+import time
+from multiprocessing import Pool
+
+from ai_module.adaptive_recommendation import recomendar_estudo
+from ai_module.recommendation import recomendar_materiais
+from functions import indices, utils
+
+PESOS = {"NP1": 0.4, "NP2": 0.6}
+TAMANHO_LOTE = 200
+
+
+def calcular_recomendacoes(aluno, turmas, materiais, diario, pesos=PESOS):
+    """
+    Calcula as recomendações de um aluno.
+
+    Parâmetros:
+        aluno (dict): Usuário (com "notas").
+        turmas (list): Turmas do aluno.
+        materiais (IndiceMateriais): Índice dos materiais.
+        diario (IndiceAulas): Índice do diário.
+        pesos (dict): Pesos de NP1 e NP2.
+
+    Retorna:
+        dict: {"materiais": [...], "estudo": [...], "gerado_em": timestamp}
+    """
+    return {
+        "materiais": recomendar_materiais(aluno, turmas, materiais, pesos),
+        "estudo": recomendar_estudo(aluno, turmas, materiais, diario, pesos),
+        "gerado_em": time.time(),
+    }
+
+
+def recomendacoes_do_aluno(aluno):
+    """
+    Retorna as recomendações gravadas do aluno. Se não houver (lote ainda não
+    executado ou recomendação invalidada), calcula na hora e grava.
+    """
+    email = aluno["email"]
+    registro = utils.load_recomendacoes().get(email)
+    if utils.recomendacao_valida(registro):
+        return registro
+
+    inicio = time.time()
+    turmas = indices.turmas_do_aluno(email)
+    recomendacao = calcular_recomendacoes(
+        aluno, turmas, indices.indice_materiais(), indices.diario_das_turmas(t["nome"] for t in turmas)
+    )
+    # Se o aluno foi invalidado durante o cálculo, o resultado pode estar
+    # desatualizado: devolve, mas não grava
+    utils.salvar_recomendacao(email, recomendacao, inicio)
+    return recomendacao
+
+
+# -------------------- Execução em lote --------------------
+_contexto = None
+
+
+def _iniciar_processo():
+    # Cada processo monta os índices uma única vez e os reutiliza em todos os lotes
+    global _contexto
+    _contexto = (indices.indice_materiais(), indices.diario_das_turmas())
+
+
+def _calcular_lote(alunos):
+    materiais, diario = _contexto
+    return [
+        (a["email"], calcular_recomendacoes(a, indices.turmas_do_aluno(a["email"]), materiais, diario))
+        for a in alunos
+    ]
+
+
+def gerar_todas(processos=None, tamanho_lote=TAMANHO_LOTE):
+    """
+    Recalcula as recomendações de todos os alunos e grava o resultado de uma vez.
+    Alunos invalidados durante a execução não recebem o resultado do lote.
+
+    Parâmetros:
+        processos (int, opcional): Número de processos (padrão: núcleos da máquina).
+            Com 1, roda no processo atual.
+        tamanho_lote (int): Alunos enviados a cada processo por vez.
+
+    Retorna:
+        int: Número de alunos processados.
+    """
+    inicio = time.time()
+    alunos = [u for u in utils.load_users() if u.get("role") == "student"]
+    lotes = [alunos[i:i + tamanho_lote] for i in range(0, len(alunos), tamanho_lote)]
+
+    resultados = {}
+    if processos == 1:
+        _iniciar_processo()
+        for lote in lotes:
+            resultados.update(_calcular_lote(lote))
+    else:
+        with Pool(processos, initializer=_iniciar_processo) as pool:
+            for parcial in pool.imap_unordered(_calcular_lote, lotes):
+                resultados.update(parcial)
+
+    utils.mesclar_recomendacoes(resultados, inicio)
+    return len(resultados)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pré-calcula as recomendações de todos os alunos.")
+    parser.add_argument("--processos", type=int, default=None, help="número de processos (padrão: núcleos)")
+    parser.add_argument("--lote", type=int, default=TAMANHO_LOTE, help="alunos por tarefa")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    total = gerar_todas(args.processos, args.lote)
+    print(f"{total} alunos processados em {time.perf_counter() - inicio:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
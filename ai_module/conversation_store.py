@@ -0,0 +1,161 @@
+"""
+Histórico das conversas do chatbot, guardado no servidor (um arquivo por
+usuário em data/conversas/) em vez da sessão do Flask.
+
+Só as trocas mais recentes são reenviadas ao modelo: no máximo
+CHAT_IA_MAX_TURNOS pares pergunta/resposta e CHAT_IA_MAX_CARACTERES
+caracteres (aproximação do limite de tokens). Com CHAT_IA_RESUMO=1, as trocas
+que saem da janela são condensadas em um resumo que acompanha o histórico.
+
+Os arquivos não passam por utils.load_json: o cache dele guarda todo arquivo
+lido, o que com um arquivo por usuário cresceria sem limite. Aqui o cache
+guarda as CHAT_IA_CONVERSAS_CACHE conversas usadas mais recentemente.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+CONVERSAS_DIR = "data/conversas"
+MAX_TURNOS = int(os.getenv("CHAT_IA_MAX_TURNOS", "10"))
+MAX_CARACTERES = int(os.getenv("CHAT_IA_MAX_CARACTERES", "8000"))
+RESUMIR = os.getenv("CHAT_IA_RESUMO", "0") == "1"
+MAX_CARACTERES_RESUMO = MAX_CARACTERES // 4
+CACHE_CONVERSAS = int(os.getenv("CHAT_IA_CONVERSAS_CACHE", "256"))
+
+# {arquivo: ((mtime_ns, tamanho), conversa)}, do menos ao mais usado
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+# Trocas do mesmo usuário são serializadas; um conjunto fixo de locks evita
+# guardar um lock por usuário
+_locks = [threading.Lock() for _ in range(64)]
+
+
+def _arquivo(email):
+    nome = hashlib.sha1(email.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(CONVERSAS_DIR, f"{nome}.json")
+
+
+def _assinatura(caminho):
+    try:
+        st = os.stat(caminho)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _guardar_cache(caminho, assinatura, conversa):
+    with _cache_lock:
+        _cache[caminho] = (assinatura, conversa)
+        _cache.move_to_end(caminho)
+        while len(_cache) > CACHE_CONVERSAS:
+            _cache.popitem(last=False)
+
+
+def carregar(email):
+    """
+    Retorna a conversa do usuário: {"resumo": str, "turnos": [{"pergunta", "resposta"}]}.
+    O dicionário pode vir do cache de leitura e não deve ser alterado.
+    """
+    caminho = _arquivo(email)
+    assinatura = _assinatura(caminho)
+    if assinatura is None:
+        return {"resumo": "", "turnos": []}
+    with _cache_lock:
+        entrada = _cache.get(caminho)
+        if entrada is not None and entrada[0] == assinatura:
+            _cache.move_to_end(caminho)
+            return entrada[1]
+
+    try:
+        with open(caminho, "r", encoding="utf-8") as f:
+            conversa = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"resumo": "", "turnos": []}
+    if not isinstance(conversa, dict):
+        # Arquivo vazio (lista) criado por versões anteriores
+        return {"resumo": "", "turnos": []}
+    _guardar_cache(caminho, assinatura, conversa)
+    return conversa
+
+
+def _salvar(email, conversa):
+    caminho = _arquivo(email)
+    os.makedirs(CONVERSAS_DIR, exist_ok=True)
+    temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(conversa, f, ensure_ascii=False)
+    os.replace(temporario, caminho)
+    _guardar_cache(caminho, _assinatura(caminho), conversa)
+
+
+def historico(email):
+    """
+    Monta o histórico no formato de model.start_chat ([{"role", "parts"}]),
+    com o resumo (se houver) antes das trocas dentro da janela.
+    """
+    conversa = carregar(email)
+    mensagens = []
+    if conversa["resumo"]:
+        mensagens.append({"role": "user", "parts": [f"Resumo da nossa conversa até aqui: {conversa['resumo']}"]})
+        mensagens.append({"role": "model", "parts": ["Certo, vou considerar esse contexto."]})
+    for turno in conversa["turnos"]:
+        mensagens.append({"role": "user", "parts": [turno["pergunta"]]})
+        mensagens.append({"role": "model", "parts": [turno["resposta"]]})
+    return mensagens
+
+
+def _tamanho(turno):
+    return len(turno["pergunta"]) + len(turno["resposta"])
+
+
+def registrar_turno(email, pergunta, resposta, resumir=None):
+    """
+    Acrescenta uma troca à conversa e descarta as mais antigas que não cabem
+    na janela.
+
+    Parâmetros:
+        email (str): Usuário dono da conversa.
+        pergunta (str): Mensagem do usuário.
+        resposta (str): Resposta do modelo.
+        resumir (callable, opcional): resumir(resumo_atual, turnos_descartados)
+            retorna o novo resumo. Se falhar, o resumo anterior é mantido.
+    """
+    with _locks[hash(email) % len(_locks)]:
+        _registrar_turno(email, pergunta, resposta, resumir)
+
+
+def _registrar_turno(email, pergunta, resposta, resumir):
+    conversa = carregar(email)
+    turnos = conversa["turnos"] + [{"pergunta": pergunta, "resposta": resposta}]
+    resumo = conversa["resumo"]
+
+    total = sum(_tamanho(t) for t in turnos)
+    descartados = []
+    # A última troca sempre fica, mesmo que sozinha passe do limite
+    while len(turnos) > 1 and (len(turnos) > MAX_TURNOS or total > MAX_CARACTERES):
+        turno = turnos.pop(0)
+        total -= _tamanho(turno)
+        descartados.append(turno)
+
+    if descartados and resumir is not None:
+        try:
+            resumo = resumir(resumo, descartados)[:MAX_CARACTERES_RESUMO]
+        except Exception as e:
+            print(f"Erro ao resumir a conversa: {e}")
+
+    _salvar(email, {"resumo": resumo, "turnos": turnos})
+
+
+def limpar(email):
+    """Apaga a conversa do usuário."""
+    caminho = _arquivo(email)
+    with _locks[hash(email) % len(_locks)]:
+        try:
+            os.remove(caminho)
+        except FileNotFoundError:
+            pass
+        with _cache_lock:
+            _cache.pop(caminho, None)
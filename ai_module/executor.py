@@ -0,0 +1,128 @@
+"""
+Executor dedicado às chamadas ao modelo de IA.
+
+As chamadas rodam em um pool próprio de CHAT_IA_WORKERS threads. No máximo
+CHAT_IA_MAX_PENDENTES chamadas ficam em andamento (executando ou na fila) ao
+mesmo tempo; além disso, a chamada é recusada na hora com Sobrecarregado, e a
+rota responde 503 sem ocupar um worker do Flask. Cada chamada tem um prazo de
+CHAT_IA_TIMEOUT segundos (TempoEsgotado).
+
+Uma chamada que estoura o prazo continua ocupando sua vaga até o modelo
+terminar, para que o limite reflita o que realmente está em andamento.
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturoTimeout
+
+WORKERS = int(os.getenv("CHAT_IA_WORKERS", "4"))
+MAX_PENDENTES = int(os.getenv("CHAT_IA_MAX_PENDENTES", "8"))
+TIMEOUT = float(os.getenv("CHAT_IA_TIMEOUT", "30"))
+
+
+class Sobrecarregado(Exception):
+    """Limite de chamadas em andamento atingido."""
+
+
+class TempoEsgotado(TimeoutError):
+    """O modelo não respondeu dentro do prazo."""
+
+
+_executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="ia")
+_vagas = threading.BoundedSemaphore(MAX_PENDENTES)
+_lock = threading.Lock()
+_stats = {"em_andamento": 0, "concluidas": 0, "recusadas": 0, "tempo_esgotado": 0}
+
+
+def _reservar():
+    if not _vagas.acquire(blocking=False):
+        with _lock:
+            _stats["recusadas"] += 1
+        raise Sobrecarregado("Limite de chamadas ao modelo atingido.")
+    with _lock:
+        _stats["em_andamento"] += 1
+
+
+def _liberar(_futuro):
+    with _lock:
+        _stats["em_andamento"] -= 1
+        _stats["concluidas"] += 1
+    _vagas.release()
+
+
+def _esgotado():
+    with _lock:
+        _stats["tempo_esgotado"] += 1
+    return TempoEsgotado("O modelo não respondeu dentro do prazo.")
+
+
+def executar(funcao, timeout=TIMEOUT):
+    """
+    Executa `funcao()` no pool e aguarda o resultado.
+
+    Raises:
+        Sobrecarregado: Se já houver MAX_PENDENTES chamadas em andamento.
+        TempoEsgotado: Se o resultado não vier em `timeout` segundos.
+    """
+    _reservar()
+    futuro = _executor.submit(funcao)
+    futuro.add_done_callback(_liberar)
+    try:
+        return futuro.result(timeout=timeout)
+    except FuturoTimeout:
+        if futuro.done():
+            raise
+        raise _esgotado() from None
+
+
+def executar_stream(funcao, timeout=TIMEOUT):
+    """
+    Executa no pool uma função que retorna um iterável (ex.: resposta em
+    stream do modelo) e devolve um gerador com os itens à medida que chegam.
+
+    A vaga é reservada na chamada (Sobrecarregado é levantado aqui, antes de
+    qualquer resposta ao cliente); TempoEsgotado é levantado pelo gerador se
+    a resposta completa não vier em `timeout` segundos.
+    """
+    _reservar()
+    fila = queue.Queue()
+    cancelado = threading.Event()
+
+    def trabalho():
+        try:
+            for item in funcao():
+                if cancelado.is_set():
+                    break
+                fila.put((False, item))
+            fila.put((True, None))
+        except Exception as e:
+            fila.put((True, e))
+
+    futuro = _executor.submit(trabalho)
+    futuro.add_done_callback(_liberar)
+    return _consumir(fila, cancelado, time.monotonic() + timeout)
+
+
+def _consumir(fila, cancelado, prazo):
+    try:
+        while True:
+            try:
+                fim, item = fila.get(timeout=max(prazo - time.monotonic(), 0))
+            except queue.Empty:
+                raise _esgotado() from None
+            if fim:
+                if item is not None:
+                    raise item
+                return
+            yield item
+    finally:
+        # Cliente desconectado ou prazo estourado: o trabalho para no próximo item
+        cancelado.set()
+
+
+def stats():
+    """Retorna as chamadas em andamento, concluídas, recusadas e com tempo esgotado."""
+    with _lock:
+        return {**_stats, "workers": WORKERS, "max_pendentes": MAX_PENDENTES, "timeout": TIMEOUT}
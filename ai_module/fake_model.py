@@ -0,0 +1,69 @@
+"""
+Modelo local que imita a parte usada de google.generativeai.GenerativeModel
+(start_chat, send_message com e sem stream, generate_content), para testar o
+chatbot sem acesso à API. Ativado com CHAT_IA_MODELO=fake.
+
+As respostas são geradas em pedaços com CHAT_IA_FAKE_ATRASO segundos entre
+eles, simulando o tempo de geração do modelo real.
+"""
+
+import os
+import time
+
+ATRASO = float(os.getenv("CHAT_IA_FAKE_ATRASO", "0.05"))
+
+
+class _Pedaco:
+    def __init__(self, texto):
+        self.text = texto
+
+
+class _RespostaStream:
+    """Iterável de pedaços; após consumido, `text` tem a resposta completa."""
+
+    def __init__(self, pedacos, atraso):
+        self._pedacos = pedacos
+        self._atraso = atraso
+        self.text = ""
+
+    def __iter__(self):
+        for pedaco in self._pedacos:
+            time.sleep(self._atraso)
+            self.text += pedaco
+            yield _Pedaco(pedaco)
+
+
+class FakeChatSession:
+    def __init__(self, modelo, history):
+        self.modelo = modelo
+        self.history = list(history or [])
+
+    def send_message(self, mensagem, stream=False):
+        texto = self.modelo.responder(mensagem, self.history)
+        self.history.append({"role": "user", "parts": [mensagem]})
+        self.history.append({"role": "model", "parts": [texto]})
+        pedacos = [palavra + " " for palavra in texto.split(" ")]
+        pedacos[-1] = pedacos[-1].rstrip()
+        resposta = _RespostaStream(pedacos, self.modelo.atraso)
+        if not stream:
+            for _ in resposta:
+                pass
+        return resposta
+
+
+class FakeModel:
+    def __init__(self, atraso=ATRASO):
+        self.atraso = atraso
+
+    def responder(self, mensagem, history):
+        trocas = len(history) // 2
+        return (
+            f"Resposta simulada para: {mensagem}\n"
+            f"(conversa com {trocas} trocas anteriores)"
+        )
+
+    def start_chat(self, history=None):
+        return FakeChatSession(self, history)
+
+    def generate_content(self, prompt):
+        return _Pedaco(f"Resumo simulado de {len(prompt)} caracteres.")
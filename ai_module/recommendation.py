@@ -1,15 +1,24 @@
+from functions.indices import IndiceMateriais
+
+
 def recomendar_materiais(aluno, turmas, materiais, pesos):
     """
     Gera recomendações de estudo para o aluno com base em notas.
     
     aluno: dict do usuário
-    turmas: lista de turmas
-    materiais: lista de materiais
+    turmas: lista de turmas (pode ser apenas a lista de turmas do aluno)
+    materiais: IndiceMateriais (ex.: functions.indices.indice_materiais())
+               ou lista de materiais
     pesos: dict de pesos {'NP1': 0.4, 'NP2': 0.6}
     
     Retorna: lista de materiais recomendados
     """
     recomendados = []
+    if not isinstance(materiais, IndiceMateriais):
+        materiais = IndiceMateriais(materiais)
+
+    # Turmas do aluno (filtradas uma única vez, fora do laço de matérias)
+    turmas_aluno = [t for t in turmas if aluno["email"] in t.get("alunos", [])]
 
     # Percorre cada matéria do aluno
     notas = aluno.get("notas", {})
@@ -21,16 +30,14 @@ def recomendar_materiais(aluno, turmas, materiais, pesos):
         # Se a média for baixa, prioriza essa matéria
         if media < 7:
             # Busca materiais da turma correspondente
-            for turma in turmas:
-                if aluno["email"] in turma.get("alunos", []):
-                    nome_turma = turma["nome"]
-                    materias_da_turma = [m for m in materiais if m["turma"] == nome_turma]
-                    for m in materias_da_turma:
-                        # Só adiciona materiais relacionados à matéria com dificuldade
-                        if materia.lower() in m["arquivo"].lower() or materia.lower() in m.get("descricao","").lower():
-                            recomendados.append({
-                                "materia": materia,
-                                "arquivo": m["arquivo"],
-                                "turma": nome_turma
-                            })
+            for turma in turmas_aluno:
+                nome_turma = turma["nome"]
+                # Só materiais relacionados à matéria com dificuldade (busca no índice)
+                for m in materiais.da_materia(nome_turma, materia):
+                    recomendados.append({
+                        "materia": materia,
+                        "arquivo": m["arquivo"],
+                        "caminho": m.get("caminho", m["arquivo"]),
+                        "turma": nome_turma
+                    })
     return recomendados
@@ -1,95 +1,248 @@
 # ai_routes.py
-from flask import Blueprint, request, jsonify, render_template, session
+from flask import Blueprint, request, jsonify, render_template, session, Response, stream_with_context
 from dotenv import load_dotenv
-import google.generativeai as genai
+import json
 import os
+import threading
 
-# ----- Blueprint -----
-ai_blueprint = Blueprint('ai', __name__)
-
-# ----- Configuração do Gemini -----
+# Variáveis do .env valem também para as configurações lidas pelo ai_module
 load_dotenv()
 
-try:
-    API_KEY = os.getenv("GEMINI_API_KEY")
-    if not API_KEY:
-        raise ValueError("A chave GEMINI_API_KEY não foi encontrada no arquivo .env.")
+from ai_module import conversation_store
+from ai_module.answer_cache import cache as cache_respostas
+from ai_module import executor as executor_ia
+from ai_module.executor import Sobrecarregado, TempoEsgotado
 
-    genai.configure(api_key=API_KEY)
+# ----- Blueprint -----
+ai_blueprint = Blueprint('ai', __name__)
 
-    # Inicializa o modelo de chat com contexto acadêmico
-    model = genai.GenerativeModel(
-        model_name='gemini-2.5-flash',
-        system_instruction=(
-            "Você é um assistente acadêmico. Suas respostas devem ser informativas, "
-            "baseadas em fatos, bem estruturadas e focadas em tópicos de ciências, história, literatura ou matemática."
+# ----- Configuração do Gemini -----
+# O SDK do Gemini só é importado e o modelo só é criado no primeiro pedido ao
+# chatbot (obter_modelo), para que subir o app ou usar a camada de dados pela
+# linha de comando não pague a inicialização da IA.
+_modelo = None
+_modelo_iniciado = False
+_modelo_lock = threading.Lock()
+
+def _criar_modelo():
+    try:
+        if os.getenv("CHAT_IA_MODELO") == "fake":
+            # Modelo local para testes sem acesso à API (ai_module/fake_model.py)
+            from ai_module.fake_model import FakeModel
+            return FakeModel()
+
+        API_KEY = os.getenv("GEMINI_API_KEY")
+        if not API_KEY:
+            raise ValueError("A chave GEMINI_API_KEY não foi encontrada no arquivo .env.")
+
+        import google.generativeai as genai
+        genai.configure(api_key=API_KEY)
+
+        # Inicializa o modelo de chat com contexto acadêmico
+        return genai.GenerativeModel(
+            model_name='gemini-2.5-flash',
+            system_instruction=(
+                "Você é um assistente acadêmico. Suas respostas devem ser informativas, "
+                "baseadas em fatos, bem estruturadas e focadas em tópicos de ciências, história, literatura ou matemática."
+            )
         )
-    )
 
-except Exception as e:
-    print(f"Erro na inicialização do Gemini: {e}")
-    model = None
+    except Exception as e:
+        print(f"Erro na inicialização do Gemini: {e}")
+        return None
+
+def obter_modelo():
+    """Retorna o modelo de chat, criando-o na primeira chamada (None se indisponível)."""
+    global _modelo, _modelo_iniciado
+    if not _modelo_iniciado:
+        with _modelo_lock:
+            if not _modelo_iniciado:
+                _modelo = _criar_modelo()
+                _modelo_iniciado = True
+    return _modelo
+
+def resumir_conversa(resumo, turnos):
+    """Condensa o resumo anterior e as trocas que saíram da janela em um novo resumo."""
+    trocas = "\n".join(f"Aluno: {t['pergunta']}\nAssistente: {t['resposta']}" for t in turnos)
+    prompt = (
+        "Resuma em poucas frases os assuntos e conclusões desta conversa, para servir "
+        f"de contexto às próximas perguntas.\n\nResumo anterior: {resumo or '(nenhum)'}\n\n{trocas}"
+    )
+    model = obter_modelo()
+    return executor_ia.executar(lambda: model.generate_content(prompt).text.strip())
 
-# ----- Rotas -----
-@ai_blueprint.route('/chatbot')
-def chatbot():
-    """Renderiza a interface do chatbot."""
-    return render_template('chatbot.html')
+def registrar_turno(user_email, user_message, resposta):
+    conversation_store.registrar_turno(
+        user_email, user_message, resposta,
+        resumir=resumir_conversa if conversation_store.RESUMIR else None,
+    )
 
-@ai_blueprint.route('/chat', methods=['POST'])
-def chat():
-    """Recebe a mensagem do usuário, interage com o Gemini e retorna a resposta."""
-    
-    if not model:
-        return jsonify({"response": "Serviço de IA indisponível."}), 503
+def validar_pedido():
+    """
+    Valida o pedido de chat.
 
+    Retorna:
+        tuple: (email, mensagem, None) ou (None, None, resposta de erro)
+    """
     user_email = session.get('email')
     if not user_email:
-        return jsonify({"response": "Usuário não logado."}), 401
+        return None, None, (jsonify({"response": "Usuário não logado."}), 401)
+
+    # Só depois do login: a primeira chamada importa o SDK e cria o modelo
+    if not obter_modelo():
+        return None, None, (jsonify({"response": "Serviço de IA indisponível."}), 503)
 
     data = request.json
     user_message = data.get('message', '').strip()
 
     if not user_message:
-        return jsonify({"response": "Por favor, digite uma pergunta."}), 400
+        return None, None, (jsonify({"response": "Por favor, digite uma pergunta."}), 400)
+
+    # O histórico fica no servidor (ai_module/conversation_store.py); a sessão
+    # guarda só a identificação do usuário. Versões antigas guardavam o
+    # histórico inteiro no cookie, então ele é descartado se ainda existir.
+    session.pop('chat_histories', None)
+    return user_email, user_message, None
 
-    # Criar estrutura JSON serializable para o histórico
-    def normalize_history(raw_history):
-        normalized = []
-        for msg in raw_history:
-            normalized.append({
-                "role": msg.role,
-                "parts": [str(p) for p in msg.parts]   # CONVERTE PARTS → TEXTO
-            })
-        return normalized
+def resposta_sobrecarregado():
+    # As chamadas ao modelo rodam em um pool limitado (ai_module/executor.py);
+    # quando ele está cheio, o pedido é recusado na hora
+    resposta = jsonify({"response": "O assistente está ocupado no momento. Tente novamente em instantes."})
+    return resposta, 503, {"Retry-After": "5"}
 
-    # 1. Criar estrutura base
-    if 'chat_histories' not in session:
-        session['chat_histories'] = {}
+MENSAGEM_TEMPO_ESGOTADO = "O assistente demorou demais para responder. Tente novamente."
 
-    if user_email not in session['chat_histories']:
-        session['chat_histories'][user_email] = []
+# ----- Rotas -----
+@ai_blueprint.route('/chatbot')
+def chatbot():
+    """Renderiza a interface do chatbot."""
+    return render_template('chatbot.html')
 
-    # 2. Recupera histórico serializável
-    user_history = session['chat_histories'][user_email]
+@ai_blueprint.route('/chat', methods=['POST'])
+def chat():
+    """Recebe a mensagem do usuário, interage com o Gemini e retorna a resposta."""
+    user_email, user_message, erro = validar_pedido()
+    if erro:
+        return erro
+    model = obter_modelo()
+
+    historico = conversation_store.historico(user_email)
+    # Perguntas sem histórico podem ser respondidas pelo cache de respostas
+    primeira = not historico
+    contexto = request.json.get('turma')
+    if primeira:
+        resposta = cache_respostas.get(user_message, contexto)
+        if resposta is not None:
+            registrar_turno(user_email, user_message, resposta)
+            return jsonify({"response": resposta})
+
+    def enviar():
+        # Inicia a sessão apenas com a janela recente da conversa (e o resumo)
+        chat_session = model.start_chat(history=historico)
+        return chat_session.send_message(user_message).text
 
     try:
-        # 3. Inicia a sessão com histórico NORMALIZADO
-        chat_session = model.start_chat(history=[
-            {"role": h["role"], "parts": h["parts"]} for h in user_history
-        ])
-        
-        # 4. Envia a mensagem
-        response = chat_session.send_message(user_message)
-
-        # 5. Normaliza o novo histórico antes de salvar
-        new_history = normalize_history(chat_session.history)
-
-        session['chat_histories'][user_email] = new_history
-        session.modified = True
-
-        return jsonify({"response": response.text})
-    
+        resposta = executor_ia.executar(enviar)
+
+        registrar_turno(user_email, user_message, resposta)
+        if primeira:
+            cache_respostas.put(user_message, resposta, contexto)
+
+        return jsonify({"response": resposta})
+
+    except Sobrecarregado:
+        return resposta_sobrecarregado()
+    except TempoEsgotado:
+        return jsonify({"response": MENSAGEM_TEMPO_ESGOTADO}), 504
     except Exception as e:
         print(f"Erro ao interagir com o Gemini: {e}")
         return jsonify({"response": "Desculpe, ocorreu um erro ao processar sua solicitação."}), 500
+
+@ai_blueprint.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Igual a /chat, mas envia a resposta em partes à medida que o modelo gera
+    (formato Server-Sent Events):
+
+        event: parcial   data: {"texto": "..."}
+        event: fim       data: {"response": "<resposta completa>"}
+        event: erro      data: {"response": "<mensagem de erro>"}
+    """
+    user_email, user_message, erro = validar_pedido()
+    if erro:
+        return erro
+    model = obter_modelo()
+
+    historico = conversation_store.historico(user_email)
+    primeira = not historico
+    contexto = request.json.get('turma')
+    em_cache = cache_respostas.get(user_message, contexto) if primeira else None
+
+    def enviar():
+        chat_session = model.start_chat(history=historico)
+        return (chunk.text for chunk in chat_session.send_message(user_message, stream=True))
+
+    if em_cache is None:
+        try:
+            pedacos = executor_ia.executar_stream(enviar)
+        except Sobrecarregado:
+            return resposta_sobrecarregado()
+
+    def evento(tipo, dados):
+        return f"event: {tipo}\ndata: {json.dumps(dados, ensure_ascii=False)}\n\n"
+
+    def gerar():
+        if em_cache is not None:
+            registrar_turno(user_email, user_message, em_cache)
+            yield evento("parcial", {"texto": em_cache})
+            yield evento("fim", {"response": em_cache})
+            return
+
+        partes = []
+        try:
+            for texto in pedacos:
+                if texto:
+                    partes.append(texto)
+                    yield evento("parcial", {"texto": texto})
+        except TempoEsgotado:
+            yield evento("erro", {"response": MENSAGEM_TEMPO_ESGOTADO})
+            return
+        except Exception as e:
+            print(f"Erro ao interagir com o Gemini: {e}")
+            yield evento("erro", {"response": "Desculpe, ocorreu um erro ao processar sua solicitação."})
+            return
+
+        resposta = "".join(partes)
+        registrar_turno(user_email, user_message, resposta)
+        if primeira:
+            cache_respostas.put(user_message, resposta, contexto)
+        yield evento("fim", {"response": resposta})
+
+    return Response(
+        stream_with_context(gerar()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@ai_blueprint.route('/chat/limpar', methods=['POST'])
+def limpar_chat():
+    """Apaga o histórico da conversa do usuário (a próxima pergunta começa do zero)."""
+    user_email = session.get('email')
+    if not user_email:
+        return jsonify({"response": "Usuário não logado."}), 401
+    conversation_store.limpar(user_email)
+    return jsonify({"ok": True})
+
+@ai_blueprint.route('/cache/stats')
+def cache_stats():
+    """Métricas do cache de respostas (acesso restrito a administradores)."""
+    if session.get('role') != 'admin':
+        return jsonify({"response": "Acesso restrito."}), 403
+    return jsonify(cache_respostas.stats())
+
+@ai_blueprint.route('/executor/stats')
+def executor_stats():
+    """Métricas do pool de chamadas ao modelo (acesso restrito a administradores)."""
+    if session.get('role') != 'admin':
+        return jsonify({"response": "Acesso restrito."}), 403
+    return jsonify(executor_ia.stats())
@@ -1,21 +1,51 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, Blueprint
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, Blueprint, Response, stream_with_context, send_from_directory
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import timedelta
-from ai_module.recommendation import recomendar_materiais
+from ai_module.batch_recommendation import recomendacoes_do_aluno
 from ai_routes import ai_blueprint
 from functions.utils import *
-from functions.media import calcular_media_c
+from functions.media import calcular_medias_lote
+from functions.eventos import publicar, assinar, total_assinantes
+from functions import estaticos
+from functions import planilhas
+from functions.promocao import promover_periodo
+from urllib.parse import quote
+from functions.indices import (
+    usuarios_por_email, get_turma, turmas_do_aluno, turmas_do_professor,
+    matricular_aluno, desmatricular_aluno, medias_do_aluno, invalidar_medias,
+    buscar_alunos as buscar_alunos_indice, BUSCA_LIMITE_PADRAO,
+    indice_materiais, registrar_material, indice_aulas, registrar_aula, editar_aula,
+    alunos_da_turma, avisos_recentes, registrar_aviso, AVISOS_LIMITE_PADRAO
+)
+import json
 import os
+import queue
+import re
+import time
 
 # -------------------- Configuração do Flask --------------------
 app = Flask(__name__)
 app.secret_key = "supersecretkey"
 app.permanent_session_lifetime = timedelta(minutes=30)
 app.register_blueprint(ai_blueprint, url_prefix='/ai_module')
+app.config["MAX_CONTENT_LENGTH"] = MAX_UPLOAD_BYTES
+# Estáticos com impressão digital (?v=hash), cache imutável e versões .gz/.br
+estaticos.registrar(app)
 
 # -------------------- Configurações Gerais --------------------
 pesos = {"NP1": 0.4, "NP2": 0.6}
 
+# Chat em tempo real (SSE): limite de conexões abertas por processo e duração
+# máxima de cada conexão (o navegador reconecta sozinho com Last-Event-ID).
+# Cada conexão ocupa uma thread do servidor enquanto está aberta e os eventos
+# circulam só dentro do processo: rode um único processo com servidor em
+# threads (o padrão do Flask, ou p.ex. gunicorn -w 1 --threads N com N acima
+# de SSE_MAX_CONEXOES); com vários processos, quem está em outro processo só
+# recebe as mensagens pela consulta periódica de /chat/<turma>
+SSE_MAX_CONEXOES = int(os.getenv("SSE_MAX_CONEXOES", "100"))
+SSE_DURACAO_MAX = int(os.getenv("SSE_DURACAO_MAX", "60"))
+SSE_HEARTBEAT = 15
+
 # -------------------- Arquivos --------------------
 USERS_FILE = "data/users.json"
 TURMAS_FILE = "data/turmas.json"
@@ -28,6 +58,11 @@ UPLOAD_FOLDER = "static/materiais"
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
 # -------------------- Rotas principais --------------------
+@app.errorhandler(413)
+def arquivo_muito_grande(e):
+    flash(f"O arquivo passa do limite de {MAX_UPLOAD_BYTES // (1024 * 1024)} MB.", "danger")
+    return redirect(request.referrer or url_for("dashboard"))
+
 @app.route("/")
 def home():
     return redirect(url_for("login"))
@@ -43,7 +78,6 @@ def register():
         password = request.form["password"]
         role = request.form["role"]
 
-        users = load_users()
         if get_user_by_email(email):
             flash("Email já registrado! Faça login.", "warning")
             return redirect(url_for("login"))
@@ -79,18 +113,17 @@ def register():
             new_user["periodo_atual"] = int(periodo_inicial)
             new_user["matricula"] = matricula
             new_user["notas"] = notas
-            turmas = load_json(TURMAS_FILE)
-            
+
             # Matricula o aluno nas turmas do primeiro período do curso
-            for materia in materias_periodo:
-                materia_nome = materia["nome"] if isinstance(materia, dict) else materia
-                turma_nome = f"{curso_nome}-{materia_nome}-P1"
-                turma = next((t for t in turmas if t["nome"] == turma_nome), None)
-                if turma and email not in turma["alunos"]:
-                    turma["alunos"].append(email)
-        users.append(new_user)
-        save_users(users)
-        save_json(TURMAS_FILE, turmas) 
+            nomes_turmas = [
+                f"{curso_nome}-{materia['nome'] if isinstance(materia, dict) else materia}-P1"
+                for materia in materias_periodo
+            ]
+            with alterar_itens(TURMAS_FILE, "nome", nomes_turmas) as turmas:
+                for turma in turmas.values():
+                    if email not in turma["alunos"]:
+                        turma["alunos"].append(email)
+        append_json_log(USERS_FILE, "append", item=new_user)
 
         flash("Registro concluído com sucesso! Faça login.", "success")
         return redirect(url_for("login"))
@@ -137,43 +170,33 @@ def dashboard():
 
     if role == "student":
         # Carrega informações
-        users = load_users()
-        current_user = next((u for u in users if u["email"] == email), None)
+        current_user = get_user_by_email(email)
 
         if not current_user:
             flash("Usuário não encontrado.", "danger")
             return redirect(url_for("logout"))
 
-        materiais = load_json(MATERIAIS_FILE)
-        turmas = load_json(TURMAS_FILE)
-        minhas_turmas = [t for t in turmas if email in t["alunos"]]
-        materiais_turma = [m for m in materiais if m["turma"] in [t["nome"] for t in minhas_turmas]]
-        avisos = [a for a in load_json(AVISOS_FILE) if a["turma"] in [t["nome"] for t in minhas_turmas]]
+        minhas_turmas = turmas_do_aluno(email)
+        nomes_turmas = {t["nome"] for t in minhas_turmas}
+        materiais = indice_materiais()
+        materiais_turma = [m for t in minhas_turmas for m in materiais.da_turma(t["nome"])]
+        # Só a primeira página; as seguintes vêm de /avisos
+        avisos = avisos_recentes(nomes_turmas)
 
         # Pega informações do curso, período e matrícula
         curso = current_user.get("curso")
         periodo = current_user.get("periodo_atual")
         matricula = current_user.get("matricula")
-        notas = current_user.get("notas", {})
-
-        # Calcula média automaticamente se não existir
-        for materia, valores in notas.items():
-            np1 = valores.get("NP1", 0)
-            np2 = valores.get("NP2", 0)
-
-            if "media" not in valores:
-                media = (np1 * pesos["NP1"]) + (np2 * pesos["NP2"])
-                valores["media"] = round(media, 2)
-
-        current_user["notas"] = notas
-        save_users(users)
+        # Médias vêm de uma visão em cache: a página não grava nada em disco
+        notas = medias_do_aluno(email)
 
         return render_template(
             "dashboard_student.html",
             user=user,
             materiais=materiais_turma,
             minhas_turmas=minhas_turmas,
-            avisos=avisos,
+            avisos=avisos["avisos"],
+            avisos_proximo=avisos["proximo"],
             email=email,
             curso=curso,
             periodo=periodo,
@@ -183,8 +206,7 @@ def dashboard():
         
     elif role == "professor":
         users = load_users()
-        turmas = load_json(TURMAS_FILE)
-        minhas_turmas = [t for t in turmas if t.get("email_professor") == session["email"]]
+        minhas_turmas = turmas_do_professor(session["email"])
         return render_template("dashboard_professor.html", user=user, users=users, minhas_turmas=minhas_turmas)
 
     elif role == "admin":
@@ -206,12 +228,12 @@ def criar_turma():
         nome = request.form["nome"]
         professor = session["user"]
 
-        turmas = load_json(TURMAS_FILE)
-        if any(t["nome"] == nome for t in turmas):
+        if get_turma(nome):
             flash("Já existe uma turma com esse nome!", "warning")
         else:
-            turmas.append({"nome": nome, "professor": professor, "email_professor": session["email"], "alunos": []})
-            save_json(TURMAS_FILE, turmas)
+            append_json_log(TURMAS_FILE, "append", item={
+                "nome": nome, "professor": professor, "email_professor": session["email"], "alunos": []
+            })
             flash(f"Turma '{nome}' criada com sucesso!", "success")
 
         return redirect(url_for("dashboard"))
@@ -224,27 +246,22 @@ def turma(nome):
         flash("Acesso restrito.", "danger")
         return redirect(url_for("dashboard"))
 
-    turmas = load_json(TURMAS_FILE)
-    turma = next((t for t in turmas if t["nome"] == nome), None)
+    turma = get_turma(nome)
     if not turma:
         flash("Turma não encontrada.", "danger")
         return redirect(url_for("dashboard"))
 
-    users = load_users()
-    alunos = [u for u in users if u["email"] in turma["alunos"]]
+    usuarios = usuarios_por_email()
+    alunos = [usuarios[e] for e in turma["alunos"] if e in usuarios]
 
     # Materiais da turma
-    materiais = load_json(MATERIAIS_FILE)
-    materiais_turma = [m for m in materiais if m["turma"] == turma["nome"]]
+    materiais_turma = indice_materiais().da_turma(turma["nome"])
 
-    # Avisos da turma
-    avisos = load_json(AVISOS_FILE)
-    avisos_turma = [a for a in avisos if a["turma"] == turma["nome"]]
-    avisos_turma = sorted(avisos_turma, key=lambda x: x["data"], reverse=True)
+    # Avisos da turma (primeira página, do mais novo ao mais antigo)
+    avisos_turma = avisos_recentes([turma["nome"]])
 
     # Diário da turma
-    diario = load_diario()
-    registro_turma = next((d for d in diario if d["turma"] == nome), {"turma": nome, "registros": []})
+    registros = indice_aulas(nome).registros(nome)
 
     curso_nome, materia_nome, periodo = parse_turma_nome(nome)
     aulas = []
@@ -271,8 +288,9 @@ def turma(nome):
         turma=turma,
         alunos=alunos,
         materiais=materiais_turma,
-        avisos=avisos_turma,
-        registros=registro_turma["registros"],
+        avisos=avisos_turma["avisos"],
+        avisos_proximo=avisos_turma["proximo"],
+        registros=registros,
         aulas=aulas,
         pesos=pesos,
         notas=notas,
@@ -280,11 +298,19 @@ def turma(nome):
 
 @app.route("/buscar_alunos")
 def buscar_alunos():
-    """Busca de alunos pelo nome (para professores adicionarem em turmas)."""
-    termo = request.args.get("q", "").lower()
-    users = load_users()
-    filtrados = [u for u in users if u["role"] == "student" and termo in u["fullname"].lower()]
-    return jsonify(filtrados)
+    """
+    Busca de alunos pelo nome (para professores adicionarem em turmas).
+
+    Parâmetros (query string): q, limite e cursor (valor "proximo" da página
+    anterior). Retorna apenas os campos exibidos no seletor de alunos.
+    """
+    if "user" not in session or session["role"] not in ("professor", "admin"):
+        return jsonify({"error": "Acesso restrito"}), 403
+
+    termo = request.args.get("q", "")
+    limite = request.args.get("limite", BUSCA_LIMITE_PADRAO, type=int)
+    cursor = request.args.get("cursor")
+    return jsonify(buscar_alunos_indice(termo, limite, cursor))
 
 @app.route("/adicionar_aluno", methods=["POST"])
 def adicionar_aluno():
@@ -295,16 +321,12 @@ def adicionar_aluno():
     turma_nome = request.form["turma"]
     aluno_email = request.form["aluno_email"]
 
-    turmas = load_json(TURMAS_FILE)
-    users = load_users()
-
-    aluno = next((u for u in users if u["email"] == aluno_email), None)
-    turma = next((t for t in turmas if t["nome"] == turma_nome), None)
+    aluno = get_user_by_email(aluno_email)
+    turma = get_turma(turma_nome)
 
     if aluno and turma:
-        if aluno_email not in turma["alunos"]:
-            turma["alunos"].append(aluno_email)
-            save_json(TURMAS_FILE, turmas)
+        if matricular_aluno(turma, aluno_email):
+            invalidar_recomendacoes([aluno_email])
             flash(f"Aluno {aluno['fullname']} adicionado à turma {turma_nome}.", "success")
         else:
             flash("Aluno já está na turma!", "warning")
@@ -322,12 +344,10 @@ def remover_aluno():
     turma_nome = request.form["turma"]
     aluno_email = request.form["aluno_email"]
 
-    turmas = load_json(TURMAS_FILE)
-    turma = next((t for t in turmas if t["nome"] == turma_nome), None)
+    turma = get_turma(turma_nome)
 
-    if turma and aluno_email in turma["alunos"]:
-        turma["alunos"].remove(aluno_email)
-        save_json(TURMAS_FILE, turmas)
+    if turma and desmatricular_aluno(turma, aluno_email):
+        invalidar_recomendacoes([aluno_email])
         flash("Aluno removido com sucesso!", "success")
     else:
         flash("Aluno não encontrado na turma.", "danger")
@@ -345,16 +365,27 @@ def upload_material():
     arquivo = request.files["arquivo"]
 
     if arquivo:
-        caminho = os.path.join(UPLOAD_FOLDER, arquivo.filename)
-        arquivo.save(caminho)
-
-        materiais = load_json(MATERIAIS_FILE)
-        materiais.append({
+        # Arquivos são guardados pelo hash do conteúdo: o mesmo PDF enviado
+        # para várias turmas ocupa o disco uma única vez
+        try:
+            salvo = salvar_arquivo_material(arquivo.stream, arquivo.filename)
+        except ArquivoMuitoGrande as e:
+            flash(str(e), "danger")
+            return redirect(url_for("turma", nome=turma))
+
+        if any(m.get("hash") == salvo["hash"] for m in indice_materiais().da_turma(turma)):
+            flash(f"O material '{arquivo.filename}' já foi enviado para esta turma.", "warning")
+            return redirect(url_for("turma", nome=turma))
+
+        registrar_material({
             "turma": turma,
             "professor": session["user"],
-            "arquivo": arquivo.filename
+            "arquivo": arquivo.filename,
+            "hash": salvo["hash"],
+            "caminho": salvo["caminho"],
+            "tamanho": salvo["tamanho"]
         })
-        save_json(MATERIAIS_FILE, materiais)
+        invalidar_recomendacoes(alunos_da_turma(turma))
 
         flash(f"Material '{arquivo.filename}' enviado para a turma {turma}.", "success")
     else:
@@ -362,6 +393,19 @@ def upload_material():
 
     return redirect(url_for("turma", nome=turma))
 
+# -------------------- Download de Materiais --------------------
+# Materiais enviados têm o hash do conteúdo como nome (ver upload_material)
+MATERIAL_POR_HASH = re.compile(r"[0-9a-f]{64}[a-z0-9.]*")
+
+@app.route("/materiais/<path:caminho>")
+def material(caminho):
+    # Responde If-None-Match/If-Modified-Since (304) e Range (206)
+    resposta = send_from_directory(os.path.abspath(UPLOAD_FOLDER), caminho, conditional=True)
+    if MATERIAL_POR_HASH.fullmatch(caminho):
+        # O nome é o hash do conteúdo: o arquivo nunca muda
+        resposta.headers["Cache-Control"] = estaticos.CACHE_IMUTAVEL
+    return resposta
+
 # -------------------- Rota para adicionar aviso --------------------
 @app.route("/adicionar_aviso", methods=["POST"])
 def adicionar_aviso():
@@ -377,20 +421,50 @@ def adicionar_aviso():
         flash("Título e mensagem não podem estar vazios.", "warning")
         return redirect(url_for("turma", nome=turma_nome))
 
-    avisos = load_avisos()
     from datetime import datetime
     novo_aviso = {
         "turma": turma_nome,
         "titulo": titulo.strip(),
         "mensagem": mensagem.strip(),
-        "data": datetime.now().strftime("%d/%m/%Y %H:%M")
+        "data": datetime.now().strftime("%d/%m/%Y %H:%M"),
+        # Milissegundos desde 1970, estritamente crescente: ordena os avisos
+        "instante": novo_id()
     }
-    avisos.append(novo_aviso)
-    save_avisos(avisos)
+    registrar_aviso(novo_aviso)
 
     flash("Aviso publicado com sucesso!", "success")
     return redirect(url_for("turma", nome=turma_nome))
 
+@app.route("/avisos")
+def listar_avisos():
+    """
+    Avisos das turmas do usuário, do mais novo ao mais antigo, em páginas.
+
+    Parâmetros (query string): turma (opcional; padrão: todas as turmas do
+    usuário), limite e cursor (valor "proximo" da página anterior).
+    """
+    if "user" not in session or session["role"] not in ("student", "professor"):
+        return jsonify({"error": "Acesso restrito"}), 403
+
+    email = session["email"]
+    if session["role"] == "student":
+        permitidas = {t["nome"] for t in turmas_do_aluno(email)}
+    else:
+        permitidas = {t["nome"] for t in turmas_do_professor(email)}
+
+    turma_nome = request.args.get("turma")
+    if turma_nome:
+        # Como na página da turma, professores podem ver qualquer turma
+        if turma_nome not in permitidas and not (session["role"] == "professor" and get_turma(turma_nome)):
+            return jsonify({"error": "Acesso restrito"}), 403
+        permitidas = {turma_nome}
+
+    limite = request.args.get("limite", AVISOS_LIMITE_PADRAO, type=int)
+    try:
+        return jsonify(avisos_recentes(permitidas, limite, request.args.get("cursor")))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
 # -------------------- Acessar Turma (Aluno) --------------------
 @app.route("/acessar_turma/<nome>")
 def acessar_turma(nome):
@@ -401,9 +475,8 @@ def acessar_turma(nome):
 
     email_aluno = session["email"]
 
-    # Carrega turmas
-    turmas = load_json(TURMAS_FILE)
-    turma = next((t for t in turmas if t["nome"] == nome), None)
+    # Carrega turma
+    turma = get_turma(nome)
 
     if not turma:
         flash("Turma não encontrada.", "danger")
@@ -415,11 +488,9 @@ def acessar_turma(nome):
         return redirect(url_for("dashboard"))
 
     # Carrega materiais e avisos da turma
-    materiais_all = load_json(MATERIAIS_FILE)
-    materiais = [m for m in materiais_all if m["turma"] == nome]
+    materiais = indice_materiais().da_turma(nome)
 
-    avisos_all = load_json(AVISOS_FILE)
-    avisos = [a for a in avisos_all if a["turma"] == nome]
+    avisos = avisos_recentes([nome])
 
     # Mural (inicialmente vazio)
     mural = []
@@ -428,7 +499,8 @@ def acessar_turma(nome):
         "acessar_turma.html",
         turma=turma,
         materiais=materiais,
-        avisos=avisos,
+        avisos=avisos["avisos"],
+        avisos_proximo=avisos["proximo"],
         mural=mural,
         user=session["user"],
         email=session.get("email")
@@ -437,9 +509,73 @@ def acessar_turma(nome):
 # -------------------- Chat da Turma --------------------
 @app.route("/chat/<turma_nome>")
 def chat_turma(turma_nome):
-    chat = load_chat_turma()
-    turma_chat = next((c for c in chat if c["turma"] == turma_nome), {"turma": turma_nome, "mensagens": []})
-    return jsonify(turma_chat)
+    turma_chat = load_chat_turma(turma_nome)
+
+    # Versão do chat vira o ETag: polls sem novidades recebem 304 sem corpo
+    cursor, total = versao_chat(turma_chat)
+    etag = f"{cursor}-{total}"
+    if request.if_none_match.contains(etag):
+        resposta = app.response_class(status=304)
+        resposta.set_etag(etag)
+        return resposta
+
+    since = request.args.get("since", type=int)
+    if since is None:
+        mensagens = turma_chat["mensagens"]
+    else:
+        mensagens = chat_desde(turma_chat, since)
+
+    resposta = jsonify({"turma": turma_nome, "mensagens": mensagens, "cursor": cursor})
+    resposta.set_etag(etag)
+    return resposta
+
+@app.route("/chat/<turma_nome>/stream")
+def chat_stream(turma_nome):
+    """
+    Envia as novidades do chat da turma via Server-Sent Events.
+
+    Cada evento "chat" tem o mesmo formato da busca incremental
+    ({"mensagens", "cursor"}). Ao reconectar, o navegador envia o último id
+    recebido (Last-Event-ID) e o que foi perdido é reenviado antes dos eventos
+    novos. Quando o limite de conexões é atingido, responde 503 e o cliente
+    volta a usar o polling de /chat/<turma_nome>.
+
+    Teste local: curl -N http://127.0.0.1:5000/chat/<turma>/stream
+    """
+    if total_assinantes() >= SSE_MAX_CONEXOES:
+        return jsonify({"error": "Muitas conexões abertas"}), 503
+
+    ultimo_id = request.headers.get("Last-Event-ID", type=int)
+
+    def formatar(evento):
+        return f"id: {evento['cursor']}\nevent: chat\ndata: {json.dumps(evento, ensure_ascii=False)}\n\n"
+
+    def gerar():
+        with assinar(turma_nome) as fila:
+            yield "retry: 5000\n\n"
+
+            # Reenvia o que foi publicado enquanto o cliente estava desconectado
+            if ultimo_id is not None:
+                turma_chat = load_chat_turma(turma_nome)
+                perdidas = chat_desde(turma_chat, ultimo_id)
+                if perdidas:
+                    cursor, _ = versao_chat(turma_chat)
+                    yield formatar({"mensagens": perdidas, "cursor": cursor})
+
+            fim = time.monotonic() + SSE_DURACAO_MAX
+            while time.monotonic() < fim:
+                try:
+                    evento = fila.get(timeout=min(SSE_HEARTBEAT, max(fim - time.monotonic(), 0)))
+                except queue.Empty:
+                    yield ": ping\n\n"
+                    continue
+                yield formatar(evento)
+
+    return Response(
+        stream_with_context(gerar()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.route("/chat/enviar", methods=["POST"])
 def chat_enviar():
@@ -448,27 +584,22 @@ def chat_enviar():
     usuario = session.get("user")
     texto = data.get("texto")
 
-    if not usuario or not texto.strip():
+    # Sem turma não há chat onde gravar (o arquivo da turma vem do nome)
+    if not usuario or not turma_nome or not texto or not texto.strip():
         return jsonify({"error": "Dados inválidos"}), 400
 
-    chat = load_chat_turma()
-    turma_chat = next((c for c in chat if c["turma"] == turma_nome), None)
     from datetime import datetime
 
     nova_msg = {
-        "id": int(datetime.now().timestamp()*1000),  # id único
+        "id": novo_id(),  # id único e crescente (usado como cursor do chat)
         "usuario": usuario,
         "texto": texto.strip(),
         "timestamp": datetime.now().strftime("%d/%m/%Y %H:%M"),
         "respostas": []
     }
 
-    if turma_chat:
-        turma_chat["mensagens"].append(nova_msg)
-    else:
-        chat.append({"turma": turma_nome, "mensagens": [nova_msg]})
-
-    save_chat_turma(chat)
+    append_chat_mensagem(turma_nome, nova_msg)
+    publicar(turma_nome, {"mensagens": [nova_msg], "cursor": nova_msg["id"]})
     return jsonify(nova_msg)
 
 @app.route("/chat/responder", methods=["POST"])
@@ -482,9 +613,8 @@ def chat_responder():
     if not usuario or not texto.strip():
         return jsonify({"error": "Dados inválidos"}), 400
 
-    chat = load_chat_turma()
-    turma_chat = next((c for c in chat if c["turma"] == turma_nome), None)
-    if not turma_chat:
+    turma_chat = load_chat_turma(turma_nome)
+    if not turma_chat["mensagens"]:
         return jsonify({"error": "Turma não encontrada"}), 404
 
     mensagem = next((m for m in turma_chat["mensagens"] if m["id"] == msg_id), None)
@@ -493,12 +623,13 @@ def chat_responder():
 
     from datetime import datetime
     resposta = {
+        "id": novo_id(),
         "usuario": usuario,
         "texto": texto.strip(),
         "timestamp": datetime.now().strftime("%d/%m/%Y %H:%M")
     }
-    mensagem["respostas"].append(resposta)
-    save_chat_turma(chat)
+    append_chat_resposta(turma_nome, msg_id, resposta)
+    publicar(turma_nome, {"mensagens": [{**mensagem, "respostas": [resposta]}], "cursor": resposta["id"]})
     return jsonify(resposta)
 
 # -------------------- Diário da Turma --------------------
@@ -508,8 +639,7 @@ def diario_turma(nome):
         flash("Acesso restrito aos professores.", "danger")
         return redirect(url_for("dashboard"))
 
-    turmas = load_json(TURMAS_FILE)
-    turma = next((t for t in turmas if t["nome"] == nome), None)
+    turma = get_turma(nome)
     if not turma:
         flash("Turma não encontrada.", "danger")
         return redirect(url_for("dashboard"))
@@ -533,43 +663,38 @@ def diario_turma(nome):
     aulas_totais = materia["aulas"]
     aulas = [f"Aula {i}" for i in range(1, aulas_totais + 1)]  # Lista de aulas disponíveis
 
-    diario = load_diario()
-    registro_turma = next((d for d in diario if d["turma"] == nome), {"turma": nome, "registros": []})
-
     if request.method == "POST":
         aula = request.form["aula"]
         conteudo = request.form["conteudo"].strip()
         if aula and conteudo:
             from datetime import datetime
             novo_registro = {
-                "id": int(datetime.now().timestamp()*1000),
+                "id": novo_id(),
                 "aula": aula,
                 "conteudo": conteudo,
                 "data": datetime.now().strftime("%d/%m/%Y %H:%M")
             }
-            registro_turma["registros"].append(novo_registro)
-            # Atualiza ou adiciona ao diário
-            diario = [d for d in diario if d["turma"] != nome] + [registro_turma]
-            save_diario(diario)
+            registrar_aula(nome, novo_registro)
+            invalidar_recomendacoes(alunos_da_turma(nome))
             flash("Registro do diário salvo com sucesso!", "success")
             return redirect(url_for("diario_turma", nome=nome))
         else:
             flash("Selecione a aula e preencha o conteúdo do registro.", "warning")
 
 
-    return render_template("turma.html", turma=turma, registros=registro_turma["registros"], aulas=aulas)
+    return render_template("turma.html", turma=turma, registros=indice_aulas(nome).registros(nome), aulas=aulas)
 
 @app.route("/turma/<nome>/diario/editar/<int:registro_id>", methods=["POST"])
 def editar_diario(nome, registro_id):
     if "user" not in session or session["role"] != "professor":
         flash("Acesso restrito aos professores.", "danger")
         return redirect(url_for("dashboard"))
-    diario = load_diario()
-    registro_turma = next((d for d in diario if d["turma"] == nome), None)
-    if not registro_turma:
+    # Só o índice desta turma: busca do registro pelo id
+    diario = indice_aulas(nome)
+    if not diario.registros(nome):
         flash("Turma não encontrada no diário.", "danger")
         return redirect(url_for("diario_turma", nome=nome))
-    registro = next((r for r in registro_turma["registros"] if r["id"] == registro_id), None)
+    registro = diario.registro(nome, registro_id)
     if not registro:
         flash("Registro não encontrado.", "danger")
         return redirect(url_for("diario_turma", nome=nome))
@@ -578,11 +703,14 @@ def editar_diario(nome, registro_id):
     aula = request.form.get("aula")
     conteudo = request.form.get("conteudo", "").strip()
     if aula and conteudo:
-        registro["aula"] = aula
-        registro["conteudo"] = conteudo
         from datetime import datetime
-        registro["data"] = datetime.now().strftime("%d/%m/%Y %H:%M") + " (editado)"
-        save_diario(diario)
+        editar_aula(nome, {
+            **registro,
+            "aula": aula,
+            "conteudo": conteudo,
+            "data": datetime.now().strftime("%d/%m/%Y %H:%M") + " (editado)"
+        })
+        invalidar_recomendacoes(alunos_da_turma(nome))
         flash("Registro editado com sucesso!", "success")
     else:
         flash("Selecione a aula e preencha o conteúdo.", "warning")
@@ -595,14 +723,13 @@ def notas_turma(nome):
         flash("Acesso restrito aos professores.", "danger")
         return redirect(url_for("dashboard"))
 
-    turmas = load_json(TURMAS_FILE)
-    turma = next((t for t in turmas if t["nome"] == nome), None)
+    turma = get_turma(nome)
     if not turma:
         flash("Turma não encontrada.", "danger")
         return redirect(url_for("dashboard"))
 
-    users = load_users()
-    alunos = [u for u in users if u["email"] in turma["alunos"]]
+    usuarios = usuarios_por_email()
+    alunos = [usuarios[e] for e in turma["alunos"] if e in usuarios]
 
     # Notas da disciplina da turma
     curso_nome, materia_nome, periodo = parse_turma_nome(nome)
@@ -615,6 +742,7 @@ def notas_turma(nome):
     pesos = turma.get("pesos", {"NP1": 0.4, "NP2": 0.6})
 
     if request.method == "POST":
+        valores = {}
         for aluno in alunos:
             np1 = request.form.get(f"nota_{aluno['email']}_NP1")
             np2 = request.form.get(f"nota_{aluno['email']}_NP2")
@@ -623,18 +751,9 @@ def notas_turma(nome):
                 np2_val = float(np2) if np2 else 0
             except ValueError:
                 np1_val = np2_val = 0
+            valores[aluno["email"]] = (np1_val, np2_val)
 
-            if "notas" not in aluno:
-                aluno["notas"] = {}
-            if materia_nome not in aluno["notas"]:
-                aluno["notas"][materia_nome] = {}
-            aluno["notas"][materia_nome]["NP1"] = np1_val
-            aluno["notas"][materia_nome]["NP2"] = np2_val
-            aluno["notas"][materia_nome]["media"] = calcular_media_c(
-                np1_val, np2_val, pesos["NP1"], pesos["NP2"]
-            )
-
-        save_users(users)
+        gravar_notas(alunos, materia_nome, valores, pesos)
         flash("Notas atualizadas com sucesso!", "success")
         return redirect(url_for("notas_turma", nome=nome))
 
@@ -647,6 +766,133 @@ def notas_turma(nome):
         tab_active="notasTab"
     )
 
+def gravar_notas(alunos, materia_nome, valores, pesos):
+    """
+    Grava NP1, NP2 e média da matéria para os alunos em `valores`
+    ({email: (NP1, NP2)}), com as médias calculadas em lote e uma única
+    gravação de users.json.
+    """
+    alvo = [aluno for aluno in alunos if aluno["email"] in valores]
+    if not alvo:
+        return
+    valores_np1 = [valores[aluno["email"]][0] for aluno in alvo]
+    valores_np2 = [valores[aluno["email"]][1] for aluno in alvo]
+
+    # Médias da turma inteira calculadas em uma única chamada
+    medias = calcular_medias_lote(valores_np1, valores_np2, pesos["NP1"], pesos["NP2"])
+
+    emails = [aluno["email"] for aluno in alvo]
+
+    # As notas são aplicadas aos usuários atuais (relidos, se outro processo
+    # os gravou), não aos objetos em cache recebidos em `alunos`; apenas os
+    # alunos da turma são regravados
+    with alterar_itens(USERS_FILE, "email", emails) as por_email:
+        for email, np1_val, np2_val, media in zip(emails, valores_np1, valores_np2, medias):
+            aluno = por_email.get(email)
+            if aluno is None:
+                continue
+            notas_materia = aluno.setdefault("notas", {}).setdefault(materia_nome, {})
+            notas_materia["NP1"] = np1_val
+            notas_materia["NP2"] = np2_val
+            notas_materia["media"] = float(media)
+
+    invalidar_medias(emails)
+    invalidar_recomendacoes(emails)
+
+@app.route("/turma/<nome>/notas/exportar")
+def exportar_notas(nome):
+    if "user" not in session or session["role"] != "professor":
+        flash("Acesso restrito aos professores.", "danger")
+        return redirect(url_for("dashboard"))
+
+    turma = get_turma(nome)
+    if not turma:
+        flash("Turma não encontrada.", "danger")
+        return redirect(url_for("dashboard"))
+
+    usuarios = usuarios_por_email()
+    alunos = [usuarios[e] for e in turma["alunos"] if e in usuarios]
+    _, materia_nome, _ = parse_turma_nome(nome)
+
+    def linhas():
+        for aluno in alunos:
+            notas_materia = aluno.get("notas", {}).get(materia_nome, {})
+            yield {
+                "matricula": aluno.get("matricula", ""),
+                "nome": aluno["fullname"],
+                "email": aluno["email"],
+                "NP1": notas_materia.get("NP1", ""),
+                "NP2": notas_materia.get("NP2", ""),
+                "media": notas_materia.get("media", ""),
+            }
+
+    formato = request.args.get("formato", "csv")
+    if formato not in ("csv", "xlsx"):
+        return "Formato inválido (use csv ou xlsx).", 400
+    nome_arquivo = f"notas-{nome}.{formato}"
+    disposicao = f"attachment; filename=\"notas.{formato}\"; filename*=UTF-8''{quote(nome_arquivo)}"
+
+    if formato == "xlsx":
+        try:
+            conteudo = planilhas.gerar_xlsx(linhas())
+        except ImportError:
+            flash("Exportação em XLSX indisponível (instale pandas e openpyxl).", "warning")
+            return redirect(url_for("notas_turma", nome=nome))
+        return Response(
+            conteudo,
+            mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            headers={"Content-Disposition": disposicao},
+        )
+
+    # CSV enviado em stream, linha a linha
+    return Response(
+        stream_with_context(planilhas.gerar_csv(linhas())),
+        mimetype="text/csv",
+        headers={"Content-Disposition": disposicao},
+    )
+
+@app.route("/turma/<nome>/notas/importar", methods=["POST"])
+def importar_notas(nome):
+    if "user" not in session or session["role"] != "professor":
+        flash("Acesso restrito aos professores.", "danger")
+        return redirect(url_for("dashboard"))
+
+    turma = get_turma(nome)
+    if not turma:
+        flash("Turma não encontrada.", "danger")
+        return redirect(url_for("dashboard"))
+
+    arquivo = request.files.get("planilha")
+    if not arquivo or not arquivo.filename:
+        flash("Selecione uma planilha (CSV ou XLSX).", "warning")
+        return redirect(url_for("notas_turma", nome=nome))
+
+    usuarios = usuarios_por_email()
+    alunos = [usuarios[e] for e in turma["alunos"] if e in usuarios]
+    _, materia_nome, _ = parse_turma_nome(nome)
+    pesos = turma.get("pesos", {"NP1": 0.4, "NP2": 0.6})
+
+    try:
+        valores, erros = planilhas.validar_notas(
+            planilhas.ler_planilha(arquivo.stream, arquivo.filename), alunos, materia_nome
+        )
+    except ImportError:
+        flash("Importação de XLSX indisponível (instale pandas e openpyxl).", "warning")
+        return redirect(url_for("notas_turma", nome=nome))
+    except (UnicodeDecodeError, ValueError) as e:
+        flash(f"Não foi possível ler a planilha: {e}", "danger")
+        return redirect(url_for("notas_turma", nome=nome))
+
+    gravar_notas(alunos, materia_nome, valores, pesos)
+
+    if valores:
+        flash(f"Notas de {len(valores)} aluno(s) importadas.", "success")
+    for erro in erros[:5]:
+        flash(erro, "warning")
+    if len(erros) > 5:
+        flash(f"... e mais {len(erros) - 5} linha(s) com problemas.", "warning")
+    return redirect(url_for("notas_turma", nome=nome))
+
 # -------------------- Cursos --------------------
 
 @app.route("/cursos")
@@ -669,8 +915,7 @@ def criar_curso():
         nome = request.form["nome"]
         periodos = int(request.form["periodos"])
 
-        cursos = load_cursos()
-        if any(c["nome"].lower() == nome.lower() for c in cursos):
+        if any(c["nome"].lower() == nome.lower() for c in load_cursos()):
             flash("Já existe um curso com esse nome!", "warning")
             return redirect(url_for("listar_cursos"))
 
@@ -679,8 +924,8 @@ def criar_curso():
             "periodos": periodos,
             "materias": {str(i): [] for i in range(1, periodos + 1)}
         }
-        cursos.append(novo_curso)
-        save_cursos(cursos)
+        with alterar_json(CURSOS_FILE) as cursos:
+            cursos.append(novo_curso)
 
         flash("Curso criado com sucesso!", "success")
         return redirect(url_for("listar_cursos"))
@@ -704,39 +949,48 @@ def editar_curso(nome):
         return redirect(url_for("listar_cursos"))
 
     if request.method == "POST":
-        users = load_users()
-        turmas = load_json(TURMAS_FILE)
-        for i in range(1, curso["periodos"] + 1):
-            materias = request.form.getlist(f"materias_{i}[]")
-            aulas = request.form.getlist(f"aulas_{i}[]")
-            professores_email = request.form.getlist(f"professores_{i}[]")
-
-            curso["materias"][str(i)] = []
-            for m, a, p_email in zip(materias, aulas, professores_email):
-                if m.strip():
-                    curso["materias"][str(i)].append({
-                        "nome": m.strip(),
-                        "aulas": int(a) if a.strip() else 0,
-                        "professor": p_email
-                    })
-
-                    # Criar turma automaticamente
-                    if p_email:
-                        turma_nome = f"{curso['nome']}-{m.strip()}-P{i}"
-                        if not any(t["nome"] == turma_nome for t in turmas):
-                            # Pega estudantes do curso e período
-                            alunos = [u["email"] for u in users
-                                    if u.get("curso") == curso["nome"]
-                                    and u.get("periodo_atual") == i]
-                            turmas.append({
-                                "nome": turma_nome,
-                                "professor": next((u["fullname"] for u in users if u["email"] == p_email), ""),
-                                "email_professor": p_email,
-                                "alunos": alunos
-                            })
-
-        save_cursos(cursos)
-        save_json(TURMAS_FILE, turmas)
+        # Estudantes do curso agrupados por período (para matrícula automática)
+        alunos_por_periodo = {}
+        for u in users:
+            if u.get("curso") == curso["nome"]:
+                alunos_por_periodo.setdefault(u.get("periodo_atual"), []).append(u["email"])
+
+        matriculados = set()
+        # As alterações são feitas em cópias: um erro no meio não grava nada
+        with alterar_json(CURSOS_FILE) as cursos, alterar_json(TURMAS_FILE) as turmas:
+            curso = next(c for c in cursos if c["nome"] == nome)
+            nomes_turmas = {t["nome"] for t in turmas}
+
+            for i in range(1, curso["periodos"] + 1):
+                materias = request.form.getlist(f"materias_{i}[]")
+                aulas = request.form.getlist(f"aulas_{i}[]")
+                professores_email = request.form.getlist(f"professores_{i}[]")
+
+                curso["materias"][str(i)] = []
+                for m, a, p_email in zip(materias, aulas, professores_email):
+                    if m.strip():
+                        curso["materias"][str(i)].append({
+                            "nome": m.strip(),
+                            "aulas": int(a) if a.strip() else 0,
+                            "professor": p_email
+                        })
+
+                        # Criar turma automaticamente
+                        if p_email:
+                            turma_nome = f"{curso['nome']}-{m.strip()}-P{i}"
+                            if turma_nome not in nomes_turmas:
+                                nomes_turmas.add(turma_nome)
+                                turmas.append({
+                                    "nome": turma_nome,
+                                    "professor": (get_user_by_email(p_email) or {}).get("fullname", ""),
+                                    "email_professor": p_email,
+                                    "alunos": list(alunos_por_periodo.get(i, []))
+                                })
+                                matriculados.update(alunos_por_periodo.get(i, []))
+
+        # Os alunos matriculados nas turmas novas têm matérias novas a recomendar
+        invalidar_recomendacoes(matriculados)
+
         flash("Curso e turmas atualizados com sucesso!", "success")
         return redirect(url_for("listar_cursos"))
 
@@ -749,13 +1003,39 @@ def deletar_curso(nome):
         flash("Acesso restrito ao administrador.", "danger")
         return redirect(url_for("dashboard"))
 
-    cursos = load_cursos()
-    cursos = [c for c in cursos if c["nome"] != nome]
-    save_cursos(cursos)
+    with alterar_json(CURSOS_FILE) as cursos:
+        cursos[:] = [c for c in cursos if c["nome"] != nome]
 
     flash("Curso removido com sucesso!", "success")
     return redirect(url_for("listar_cursos"))
 
+@app.route("/cursos/<nome>/promover", methods=["POST"])
+def promover_curso(nome):
+    if "role" not in session or session["role"] != "admin":
+        flash("Acesso restrito ao administrador.", "danger")
+        return redirect(url_for("dashboard"))
+
+    periodo = request.form.get("periodo", "")
+    if not periodo.isdigit():
+        flash("Período inválido.", "danger")
+        return redirect(url_for("listar_cursos"))
+    periodo = int(periodo)
+
+    try:
+        resultado = promover_periodo(nome, periodo, remover_anteriores=not request.form.get("manter_anteriores"))
+    except ValueError as e:
+        flash(str(e), "danger")
+        return redirect(url_for("listar_cursos"))
+
+    if not resultado["promovidos"]:
+        flash(f"Nenhum aluno no {periodo}º período de {nome}.", "info")
+        return redirect(url_for("listar_cursos"))
+
+    flash(f"{len(resultado['promovidos'])} aluno(s) promovido(s) para o {periodo + 1}º período.", "success")
+    if resultado["sem_turma"]:
+        flash("Matérias sem turma criada: " + ", ".join(resultado["sem_turma"]) + ".", "warning")
+    return redirect(url_for("listar_cursos"))
+
 @app.route("/recomendacoes")
 def recomendacoes():
     if "user" not in session or session["role"] != "student":
@@ -763,17 +1043,14 @@ def recomendacoes():
         return redirect(url_for("dashboard"))
 
     email = session["email"]
-    users = load_users()
-    aluno = next((u for u in users if u["email"] == email), None)
+    aluno = get_user_by_email(email)
     if not aluno:
         flash("Aluno não encontrado.", "danger")
         return redirect(url_for("dashboard"))
 
-    turmas = load_json(TURMAS_FILE)
-    materiais = load_json(MATERIAIS_FILE)
-    pesos = {"NP1": 0.4, "NP2": 0.6}
-
-    recomendados = recomendar_materiais(aluno, turmas, materiais, pesos)
+    # Pré-calculadas pelo lote (ai_module/batch_recommendation.py); se ainda
+    # não existirem para o aluno, são calculadas agora e gravadas
+    recomendados = recomendacoes_do_aluno(aluno)["materiais"]
 
     return render_template("recomendacoes.html", user=aluno["fullname"], recomendados=recomendados)
 
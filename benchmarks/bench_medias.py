@@ -0,0 +1,60 @@
+"""
+Benchmark do cálculo de médias: uma chamada ctypes por aluno, uma chamada C
+em lote (calcular_medias) e NumPy vetorizado.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_medias [quantidade_de_alunos ...]
+
+Para medir o caminho em C no Linux, compile antes a biblioteca:
+    gcc -shared -fPIC -O2 -o libs/libnotas.so notas.c
+"""
+
+import sys
+import time
+
+import numpy as np
+
+from functions import media
+
+
+def _medir(funcao, repeticoes=5):
+    """Retorna o melhor tempo (em ms) entre as repetições."""
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor * 1000
+
+
+def executar(quantidade):
+    rng = np.random.default_rng(42)
+    np1 = rng.uniform(0, 10, quantidade)
+    np2 = rng.uniform(0, 10, quantidade)
+    np1_lista, np2_lista = np1.tolist(), np2.tolist()
+
+    casos = {
+        "python (loop)": lambda: [a * 0.4 + b * 0.6 for a, b in zip(np1_lista, np2_lista)],
+        "numpy": lambda: media.calcular_medias_lote(np1_lista, np2_lista, 0.4, 0.6, motor="numpy"),
+    }
+    media.carregar_biblioteca()
+    if media.lib is not None:
+        casos["ctypes por aluno"] = lambda: [
+            media.calcular_media_c(a, b, 0.4, 0.6) for a, b in zip(np1_lista, np2_lista)
+        ]
+    if media._lote_c is not None:
+        casos["C em lote"] = lambda: media.calcular_medias_lote(np1_lista, np2_lista, 0.4, 0.6, motor="c")
+
+    print(f"\n{quantidade} alunos")
+    for nome, funcao in casos.items():
+        print(f"  {nome:<18} {_medir(funcao):9.3f} ms")
+    if media.lib is None:
+        print("  (biblioteca C não encontrada: casos em C ignorados)")
+    elif media._lote_c is None:
+        print("  (biblioteca C sem calcular_medias: recompile notas.c)")
+
+
+if __name__ == "__main__":
+    quantidades = [int(q) for q in sys.argv[1:]] or [10_000, 100_000]
+    for quantidade in quantidades:
+        executar(quantidade)
@@ -0,0 +1,87 @@
+"""
+Benchmark da inicialização do app: tempo para importar app.py, tempo da
+primeira requisição e tempo da primeira requisição ao chatbot.
+
+Cada medição roda em um processo Python novo (como um worker recém-criado),
+sobre uma cópia de data/ em um diretório temporário. Por padrão o chatbot usa
+o modelo local (CHAT_IA_MODELO=fake); com --gemini, usa o modelo real
+(requer GEMINI_API_KEY), incluindo a importação do SDK.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_startup [--repeticoes N] [--gemini]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_MEDICAO = r"""
+import json, sys, time
+sys.path.insert(0, sys.argv[1])
+inicio = time.perf_counter()
+import app
+importado = time.perf_counter()
+sdk_no_boot = "google.generativeai" in sys.modules
+numpy_no_boot = "numpy" in sys.modules
+
+cliente = app.app.test_client()
+cliente.get("/")
+primeira = time.perf_counter()
+
+with cliente.session_transaction() as sessao:
+    sessao["user"] = "Benchmark"
+    sessao["email"] = "benchmark@intec.local"
+    sessao["role"] = "student"
+cliente.post("/ai_module/chat", json={"message": "O que é uma variável?"})
+primeira_ia = time.perf_counter()
+
+print(json.dumps({
+    "import_app": importado - inicio,
+    "primeira_requisicao": primeira - importado,
+    "primeira_requisicao_ia": primeira_ia - primeira,
+    "sdk_no_boot": sdk_no_boot,
+    "numpy_no_boot": numpy_no_boot,
+}))
+"""
+
+
+def medir(gemini=False):
+    """Executa uma medição em um processo novo e retorna os tempos (em segundos)."""
+    with tempfile.TemporaryDirectory() as trabalho:
+        shutil.copytree(os.path.join(RAIZ, "data"), os.path.join(trabalho, "data"))
+        env = dict(os.environ)
+        if not gemini:
+            env["CHAT_IA_MODELO"] = "fake"
+            env["CHAT_IA_FAKE_ATRASO"] = "0"
+        resultado = subprocess.run(
+            [sys.executable, "-c", _MEDICAO, RAIZ],
+            cwd=trabalho, env=env, capture_output=True, text=True, check=True,
+        )
+        return json.loads(resultado.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede o tempo de inicialização do app.")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--gemini", action="store_true", help="usa o modelo real em vez do local")
+    args = parser.parse_args()
+
+    medicoes = [medir(args.gemini) for _ in range(args.repeticoes)]
+
+    print(f"{args.repeticoes} processos (mediana)")
+    for chave in ("import_app", "primeira_requisicao", "primeira_requisicao_ia"):
+        valor = statistics.median(m[chave] for m in medicoes)
+        print(f"  {chave:<24} {valor * 1000:9.1f} ms")
+    print(f"  SDK do Gemini importado no boot: {'sim' if medicoes[0]['sdk_no_boot'] else 'não'}")
+    print(f"  NumPy importado no boot:         {'sim' if medicoes[0]['numpy_no_boot'] else 'não'}")
+
+
+if __name__ == "__main__":
+    main()
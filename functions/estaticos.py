@@ -0,0 +1,147 @@
+"""
+Entrega dos arquivos estáticos com cache no navegador.
+
+- Impressão digital: todo url_for('static', filename=...) ganha "?v=<hash do
+  conteúdo>". Como a URL muda quando o arquivo muda, essas respostas vão com
+  Cache-Control "immutable" por um ano e visitas repetidas não baixam nada.
+- Pré-compressão: arquivos de texto (CSS, JS, SVG) podem ter versões .gz e
+  .br geradas por este módulo; elas são enviadas a quem aceita a codificação.
+- Sem "?v=", os arquivos são servidos com ETag (respostas 304 e Range).
+
+Para gerar as versões comprimidas (brotli é opcional: pip install brotli):
+    python -m functions.estaticos [diretorio]
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import sys
+import threading
+
+from flask import request, send_from_directory
+from werkzeug.security import safe_join
+
+EXTENSOES_COMPRIMIVEIS = (".css", ".js", ".svg")
+CACHE_IMUTAVEL = "public, max-age=31536000, immutable"
+# Codificações na ordem de preferência: (nome no Accept-Encoding, sufixo do arquivo)
+CODIFICACOES = (("br", ".br"), ("gzip", ".gz"))
+
+_impressoes = {}
+_lock = threading.Lock()
+
+
+def impressao_digital(caminho):
+    """
+    Retorna os 12 primeiros caracteres do SHA-256 do arquivo (None se não
+    existir). O resultado fica em cache enquanto o arquivo não mudar.
+    """
+    try:
+        st = os.stat(caminho)
+    except OSError:
+        return None
+    assinatura = (st.st_mtime_ns, st.st_size)
+    with _lock:
+        atual = _impressoes.get(caminho)
+        if atual and atual[0] == assinatura:
+            return atual[1]
+
+    sha = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(64 * 1024), b""):
+            sha.update(bloco)
+    impressao = sha.hexdigest()[:12]
+    with _lock:
+        _impressoes[caminho] = (assinatura, impressao)
+    return impressao
+
+
+def _variante_comprimida(diretorio, filename):
+    """Retorna (codificação, nome do arquivo comprimido) aceitos pelo cliente, ou None."""
+    if not filename.endswith(EXTENSOES_COMPRIMIVEIS):
+        return None
+    original = safe_join(diretorio, filename)
+    if original is None or not os.path.isfile(original):
+        return None
+    aceitas = request.headers.get("Accept-Encoding", "")
+    for codificacao, sufixo in CODIFICACOES:
+        variante = original + sufixo
+        if codificacao in aceitas and os.path.isfile(variante) \
+                and os.path.getmtime(variante) >= os.path.getmtime(original):
+            return codificacao, filename + sufixo
+    return None
+
+
+def registrar(app):
+    """Configura impressão digital, pré-compressão e cache dos estáticos do app."""
+
+    @app.url_defaults
+    def adicionar_versao(endpoint, values):
+        if endpoint == "static" and "filename" in values and "v" not in values:
+            impressao = impressao_digital(os.path.join(app.static_folder, values["filename"]))
+            if impressao:
+                values["v"] = impressao
+
+    def servir_estatico(filename):
+        variante = _variante_comprimida(app.static_folder, filename)
+        if variante is None:
+            resposta = app.send_static_file(filename)
+        else:
+            codificacao, arquivo = variante
+            mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+            resposta = send_from_directory(app.static_folder, arquivo, mimetype=mimetype)
+            resposta.headers["Content-Encoding"] = codificacao
+        if filename.endswith(EXTENSOES_COMPRIMIVEIS):
+            resposta.vary.add("Accept-Encoding")
+
+        # Só a URL com a versão atual pode ser guardada para sempre
+        versao = request.args.get("v")
+        if versao and versao == impressao_digital(os.path.join(app.static_folder, filename)):
+            resposta.headers["Cache-Control"] = CACHE_IMUTAVEL
+        return resposta
+
+    app.view_functions["static"] = servir_estatico
+
+
+def comprimir(diretorio="static"):
+    """
+    Gera as versões .gz (e .br, se o pacote brotli estiver instalado) dos
+    arquivos de texto do diretório. Versões que não ficam menores são omitidas.
+
+    Retorna:
+        list[str]: Arquivos gerados.
+    """
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+
+    gerados = []
+    for raiz, _, arquivos in os.walk(diretorio):
+        for nome in arquivos:
+            if not nome.endswith(EXTENSOES_COMPRIMIVEIS):
+                continue
+            caminho = os.path.join(raiz, nome)
+            with open(caminho, "rb") as f:
+                conteudo = f.read()
+
+            variantes = {".gz": gzip.compress(conteudo, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                variantes[".br"] = brotli.compress(conteudo, quality=11)
+
+            for sufixo, comprimido in variantes.items():
+                if len(comprimido) >= len(conteudo):
+                    continue
+                with open(caminho + sufixo, "wb") as f:
+                    f.write(comprimido)
+                gerados.append(caminho + sufixo)
+
+    if brotli is None:
+        print("Pacote brotli não instalado: apenas versões .gz foram geradas.")
+    return gerados
+
+
+if __name__ == "__main__":
+    diretorio = sys.argv[1] if len(sys.argv) > 1 else "static"
+    for arquivo in comprimir(diretorio):
+        print(arquivo)
@@ -0,0 +1,75 @@
+"""
+Canal de eventos em memória (pub/sub) usado para enviar novidades do chat
+das turmas aos navegadores conectados via Server-Sent Events.
+
+Cada assinante recebe uma fila própria. Publicar nunca bloqueia: se a fila de
+um assinante lento estiver cheia, o evento é descartado para ele, e o cliente
+recupera o que perdeu pela busca incremental (/chat/<turma>?since=<cursor>).
+
+Os eventos só circulam dentro do processo atual. Com vários workers, a
+página da turma (templates/acessar_turma.html) mantém uma busca lenta pelo
+chat enquanto o SSE está aberto, para receber o que foi enviado a outros
+processos.
+"""
+
+import queue
+import threading
+from contextlib import contextmanager
+
+_assinantes = {}
+_lock = threading.Lock()
+
+
+def publicar(canal, evento):
+    """
+    Entrega um evento a todos os assinantes do canal.
+
+    Parâmetros:
+        canal (str): Nome do canal (ex.: nome da turma).
+        evento (dict): Dados do evento.
+    """
+    with _lock:
+        filas = list(_assinantes.get(canal, ()))
+    for fila in filas:
+        try:
+            fila.put_nowait(evento)
+        except queue.Full:
+            pass
+
+
+@contextmanager
+def assinar(canal, tamanho_fila=100):
+    """
+    Registra um assinante no canal enquanto o bloco `with` estiver ativo.
+
+    Exemplo:
+        with assinar("ADS-Algoritmos-P1") as fila:
+            evento = fila.get(timeout=15)
+
+    Parâmetros:
+        canal (str): Nome do canal.
+        tamanho_fila (int): Máximo de eventos pendentes para este assinante.
+
+    Retorna:
+        queue.Queue: Fila de onde os eventos devem ser lidos.
+    """
+    fila = queue.Queue(maxsize=tamanho_fila)
+    with _lock:
+        _assinantes.setdefault(canal, set()).add(fila)
+    try:
+        yield fila
+    finally:
+        with _lock:
+            filas = _assinantes.get(canal)
+            if filas is not None:
+                filas.discard(fila)
+                if not filas:
+                    del _assinantes[canal]
+
+
+def total_assinantes(canal=None):
+    """Retorna o número de assinantes de um canal ou de todos os canais."""
+    with _lock:
+        if canal is not None:
+            return len(_assinantes.get(canal, ()))
+        return sum(len(filas) for filas in _assinantes.values())
@@ -0,0 +1,621 @@
+"""
+Índices em memória derivados dos dados de functions/utils.py.
+
+Cada índice é construído a partir do conteúdo devolvido por load_json e fica
+guardado junto com a geração do arquivo de origem (utils.geracao). Enquanto o
+arquivo não for relido nem salvo, as consultas são buscas em dicionário; após
+um save_* o índice é refeito na próxima consulta.
+
+Com o backend SQLite, as buscas pontuais de turmas (get_turma,
+turmas_do_aluno, turmas_do_professor) consultam os índices do banco, sem
+recarregar a coleção a cada alteração.
+"""
+
+import heapq
+import threading
+from collections import Counter
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime
+from itertools import islice
+
+from functions import storage_sqlite, utils
+
+_indices = {}
+_lock = threading.Lock()
+
+
+def _derivado(nome, fontes, construir):
+    """
+    Retorna o índice `nome`, reconstruindo-o quando algum arquivo de origem
+    mudar de geração.
+
+    Parâmetros:
+        nome (str): Identificador do índice.
+        fontes (list[str]): Arquivos dos quais o índice depende.
+        construir (callable): Recebe os conteúdos (na ordem de `fontes`) e
+            retorna o índice.
+    """
+    dados, chave = zip(*(utils.load_json_com_geracao(f) for f in fontes))
+    with _lock:
+        atual = _indices.get(nome)
+        if atual is not None and atual[0] == chave:
+            return atual[1]
+    indice = construir(*dados)
+    with _lock:
+        _indices[nome] = (chave, indice)
+    return indice
+
+
+def _salvar_e_atualizar(nome, arquivo, salvar, atualizar, fontes=None):
+    """
+    Executa `salvar()` (que grava `arquivo`) e aplica `atualizar(indice)` ao
+    índice `nome` no lugar, em vez de reconstruí-lo. Se outra gravação
+    aconteceu no meio, o índice fica para ser reconstruído na próxima consulta.
+
+    `fontes` é a lista de arquivos do índice (padrão: apenas `arquivo`).
+    """
+    fontes = fontes or [arquivo]
+    posicao = fontes.index(arquivo)
+    antes = tuple(utils.geracao(f) for f in fontes)
+    salvar()
+    depois = tuple(utils.geracao(f) for f in fontes)
+    esperado = antes[:posicao] + (antes[posicao] + 1,) + antes[posicao + 1:]
+    with _lock:
+        atual = _indices.get(nome)
+        if atual is None or atual[0] != antes or depois != esperado:
+            return
+        atualizar(atual[1])
+        _indices[nome] = (depois, atual[1])
+
+
+# ===============================
+# Usuários
+# ===============================
+def usuarios_por_email():
+    """
+    Retorna o índice {email: usuário}. Os usuários são os mesmos objetos da
+    lista de load_users, então alterações seguidas de save_users valem para ambos.
+    """
+    return _derivado("usuarios_por_email", [utils.USERS_FILE],
+                     lambda users: {u["email"]: u for u in users})
+
+
+# ===============================
+# Turmas e matrículas
+# ===============================
+def _construir_turmas(turmas):
+    indice = {"por_nome": {}, "por_aluno": {}, "por_professor": {}, "alunos": {}}
+    for t in turmas:
+        indice["por_nome"][t["nome"]] = t
+        indice["alunos"][t["nome"]] = set(t.get("alunos", []))
+        indice["por_professor"].setdefault(t.get("email_professor"), []).append(t)
+        for email in t.get("alunos", []):
+            indice["por_aluno"].setdefault(email, []).append(t)
+    return indice
+
+
+def _indice_turmas():
+    return _derivado("turmas", [utils.TURMAS_FILE], _construir_turmas)
+
+
+def get_turma(nome):
+    """Busca uma turma pelo nome."""
+    if utils.STORAGE_BACKEND == "sqlite":
+        return storage_sqlite.get_turma(nome)
+    return _indice_turmas()["por_nome"].get(nome)
+
+
+def turmas_do_aluno(email):
+    """Lista as turmas em que o aluno está matriculado."""
+    if utils.STORAGE_BACKEND == "sqlite":
+        return storage_sqlite.turmas_do_aluno(email)
+    return list(_indice_turmas()["por_aluno"].get(email, []))
+
+
+def turmas_do_professor(email):
+    """Lista as turmas do professor (pelo email_professor)."""
+    if utils.STORAGE_BACKEND == "sqlite":
+        return storage_sqlite.turmas_do_professor(email)
+    return list(_indice_turmas()["por_professor"].get(email, []))
+
+
+def alunos_da_turma(nome):
+    """Retorna o conjunto de e-mails dos alunos da turma (vazio se não existir)."""
+    return _indice_turmas()["alunos"].get(nome, set())
+
+
+def _alterar_matricula(turma, email, matricular):
+    """
+    Aplica a alteração à turma atual (relida, se outro processo a gravou) e
+    grava apenas essa turma. O índice de turmas é refeito na próxima consulta.
+
+    Retorna:
+        bool: False se não havia o que alterar (ou a turma não existe mais).
+    """
+    with utils.alterar_itens(utils.TURMAS_FILE, "nome", [turma["nome"]]) as turmas:
+        atual = turmas.get(turma["nome"])
+        if atual is None or (email in atual["alunos"]) == matricular:
+            turmas.clear()
+            return False
+        if matricular:
+            atual["alunos"].append(email)
+        else:
+            atual["alunos"].remove(email)
+    return True
+
+
+def matricular_aluno(turma, email):
+    """
+    Adiciona o aluno à turma (um dicionário obtido de get_turma) e persiste.
+
+    Retorna:
+        bool: False se o aluno já estava matriculado.
+    """
+    if email in turma["alunos"]:
+        return False
+    return _alterar_matricula(turma, email, True)
+
+
+def desmatricular_aluno(turma, email):
+    """
+    Remove o aluno da turma (um dicionário obtido de get_turma) e persiste.
+
+    Retorna:
+        bool: False se o aluno não estava matriculado.
+    """
+    if email not in turma["alunos"]:
+        return False
+    return _alterar_matricula(turma, email, False)
+
+
+# ===============================
+# Médias dos alunos
+# ===============================
+PESOS_PADRAO = {"NP1": 0.4, "NP2": 0.6}
+
+
+def _memo_medias():
+    # Um dicionário vazio por geração de users.json + turmas.json: qualquer
+    # gravação de notas (ou de pesos) descarta todas as médias calculadas
+    return _derivado("medias", [utils.USERS_FILE, utils.TURMAS_FILE], lambda users, turmas: {})
+
+
+def medias_do_aluno(email):
+    """
+    Retorna as notas do aluno com a média de cada matéria, sem alterar nem
+    gravar os dados do usuário.
+
+    Quando a matéria ainda não tem "media" gravada (o lançamento de notas
+    sempre grava), ela é calculada com os pesos da turma correspondente.
+    O resultado fica em cache até users.json ou turmas.json mudarem.
+
+    Retorna:
+        dict: {matéria: {"NP1", "NP2", "media"}} (vazio se o aluno não existir).
+    """
+    memo = _memo_medias()
+    view = memo.get(email)
+    if view is not None:
+        return view
+
+    aluno = usuarios_por_email().get(email) or {}
+    pesos_por_materia = {}
+    for turma in turmas_do_aluno(email):
+        _, materia, _ = utils.parse_turma_nome(turma["nome"])
+        if materia:
+            pesos_por_materia[materia] = turma.get("pesos", PESOS_PADRAO)
+
+    view = {}
+    for materia, valores in aluno.get("notas", {}).items():
+        np1 = valores.get("NP1", 0)
+        np2 = valores.get("NP2", 0)
+        media = valores.get("media")
+        if media is None:
+            pesos = pesos_por_materia.get(materia, PESOS_PADRAO)
+            media = round(np1 * pesos["NP1"] + np2 * pesos["NP2"], 2)
+        view[materia] = {**valores, "NP1": np1, "NP2": np2, "media": media}
+
+    memo[email] = view
+    return view
+
+
+def invalidar_medias(emails=None):
+    """Descarta as médias em cache dos alunos informados (ou de todos)."""
+    memo = _memo_medias()
+    if emails is None:
+        memo.clear()
+    for email in emails or ():
+        memo.pop(email, None)
+
+
+# ===============================
+# Busca de alunos por nome
+# ===============================
+BUSCA_LIMITE_PADRAO = 20
+BUSCA_LIMITE_MAXIMO = 50
+CAMPOS_BUSCA = ("fullname", "email", "matricula", "curso", "periodo_atual")
+
+
+def _construir_busca(users):
+    alunos = sorted(
+        (u for u in users if u.get("role") == "student"),
+        key=lambda u: (utils.normalizar_texto(u["fullname"]), u["email"]),
+    )
+    chaves = [f"{utils.normalizar_texto(u['fullname'])}\x00{u['email']}" for u in alunos]
+    tokens = sorted(
+        (token, posicao)
+        for posicao, u in enumerate(alunos)
+        for token in set(utils.tokenizar(u["fullname"]))
+    )
+    return {
+        "alunos": alunos,
+        "chaves": chaves,
+        "tokens": tokens,
+        "palavras": [t for t, _ in tokens],
+    }
+
+
+def buscar_alunos(termo, limite=BUSCA_LIMITE_PADRAO, cursor=None):
+    """
+    Busca alunos cujo nome contenha palavras começando com cada palavra do
+    termo, ignorando acentos e maiúsculas ("jo sil" encontra "João da Silva").
+
+    Parâmetros:
+        termo (str): Texto digitado.
+        limite (int): Máximo de resultados (até BUSCA_LIMITE_MAXIMO).
+        cursor (str, opcional): Valor "proximo" da página anterior.
+
+    Retorna:
+        dict: {"alunos": [apenas CAMPOS_BUSCA], "proximo": cursor ou None}
+    """
+    limite = max(1, min(int(limite), BUSCA_LIMITE_MAXIMO))
+    palavras_termo = utils.tokenizar(termo)
+    if not palavras_termo:
+        return {"alunos": [], "proximo": None}
+
+    indice = _derivado("busca_alunos", [utils.USERS_FILE], _construir_busca)
+    palavras, tokens = indice["palavras"], indice["tokens"]
+
+    # Intervalo de tokens que começam com cada palavra; o mais estreito guia a busca
+    intervalos = [
+        (bisect_left(palavras, p), bisect_left(palavras, p + "\x7f")) for p in palavras_termo
+    ]
+    intervalos.sort(key=lambda i: i[1] - i[0])
+    candidatos = {tokens[i][1] for i in range(*intervalos[0])}
+    for inicio, fim in intervalos[1:]:
+        if not candidatos:
+            break
+        candidatos &= {tokens[i][1] for i in range(inicio, fim)}
+
+    # A posição segue a ordem alfabética, então o cursor é a chave do último item
+    inicio_pagina = bisect_right(indice["chaves"], cursor) if cursor else 0
+    posicoes = sorted(p for p in candidatos if p >= inicio_pagina)
+
+    pagina = posicoes[:limite]
+    alunos = [{c: indice["alunos"][p].get(c) for c in CAMPOS_BUSCA} for p in pagina]
+    proximo = indice["chaves"][pagina[-1]] if len(posicoes) > limite else None
+    return {"alunos": alunos, "proximo": proximo}
+
+
+# ===============================
+# Materiais por turma e palavra-chave
+# ===============================
+# Palavras muito comuns nos nomes das matérias, ignoradas na busca
+PALAVRAS_IGNORADAS = {"a", "o", "e", "de", "da", "do", "das", "dos", "em", "para"}
+
+
+def palavras_chave(texto):
+    """Palavras normalizadas de um texto, sem as PALAVRAS_IGNORADAS."""
+    return [p for p in utils.tokenizar(texto) if p not in PALAVRAS_IGNORADAS]
+
+
+class IndiceMateriais:
+    """
+    Índice dos materiais: turma → materiais e, por turma, a lista ordenada dos
+    sufixos das palavras do nome de arquivo e da descrição de cada material.
+
+    Uma matéria é procurada como no cálculo original (o nome da matéria contido
+    no nome do arquivo ou na descrição, sem diferenciar maiúsculas e acentos):
+    os sufixos dão, por busca binária, os materiais que contêm cada palavra da
+    matéria em qualquer posição, e só esses candidatos são conferidos.
+    """
+
+    def __init__(self, materiais=()):
+        self.materiais = []
+        self.textos = []
+        self.por_turma = {}
+        self.sufixos = {}
+        for m in materiais:
+            self.adicionar(m)
+
+    def adicionar(self, material):
+        posicao = len(self.materiais)
+        self.materiais.append(material)
+        self.textos.append((
+            utils.normalizar_texto(material["arquivo"]),
+            utils.normalizar_texto(material.get("descricao", "")),
+        ))
+        turma = material["turma"]
+        self.por_turma.setdefault(turma, []).append(material)
+        sufixos = self.sufixos.setdefault(turma, [])
+        palavras = set(utils.tokenizar(f"{material['arquivo']} {material.get('descricao', '')}"))
+        for palavra in palavras:
+            for i in range(len(palavra)):
+                insort(sufixos, (palavra[i:], posicao))
+
+    def da_turma(self, turma):
+        """Materiais da turma, na ordem de envio."""
+        return self.por_turma.get(turma, [])
+
+    def _contendo(self, turma, palavra):
+        """Posições dos materiais da turma com uma palavra que contém `palavra`."""
+        sufixos = self.sufixos.get(turma, [])
+        inicio = bisect_left(sufixos, (palavra,))
+        fim = bisect_left(sufixos, (palavra + "\x7f",))
+        return {posicao for _, posicao in sufixos[inicio:fim]}
+
+    def da_materia(self, turma, materia):
+        """
+        Materiais da turma relacionados à matéria: o nome do arquivo ou a
+        descrição contém o nome da matéria.
+        """
+        frase = utils.normalizar_texto(materia)
+        palavras = palavras_chave(materia)
+        if palavras:
+            conjuntos = sorted((self._contendo(turma, p) for p in palavras), key=len)
+            candidatos = set(conjuntos[0]).intersection(*conjuntos[1:])
+        else:
+            candidatos = range(len(self.materiais))
+        return [
+            self.materiais[p] for p in sorted(candidatos)
+            if self.materiais[p]["turma"] == turma and (frase in self.textos[p][0] or frase in self.textos[p][1])
+        ]
+
+
+def indice_materiais():
+    """Retorna o índice invertido dos materiais de materiais.json."""
+    return _derivado("materiais", [utils.MATERIAIS_FILE], IndiceMateriais)
+
+
+def registrar_material(material):
+    """
+    Acrescenta um material (sem reescrever materiais.json) e atualiza o
+    índice invertido no lugar.
+    """
+    _salvar_e_atualizar(
+        "materiais", utils.MATERIAIS_FILE,
+        lambda: utils.append_material(material),
+        lambda indice: indice.adicionar(material),
+    )
+
+
+# ===============================
+# Avisos por turma, em ordem cronológica
+# ===============================
+AVISOS_LIMITE_PADRAO = 20
+AVISOS_LIMITE_MAXIMO = 100
+
+
+def instante_aviso(aviso):
+    """
+    Momento da publicação do aviso, em milissegundos desde 1970. Avisos
+    antigos não têm "instante", apenas "data" ("dd/mm/AAAA HH:MM"), que é
+    convertida.
+    """
+    if "instante" in aviso:
+        return aviso["instante"]
+    try:
+        return int(datetime.strptime(aviso.get("data", ""), "%d/%m/%Y %H:%M").timestamp() * 1000)
+    except ValueError:
+        return 0
+
+
+class IndiceAvisos:
+    """
+    Avisos de cada turma ordenados por (instante, posição em avisos.json).
+    A posição desempata avisos do mesmo instante e faz parte do cursor das
+    páginas, que é estável enquanto avisos.json só recebe acréscimos.
+    """
+
+    def __init__(self, avisos=()):
+        self.total = 0
+        self.por_turma = {}
+        for a in avisos:
+            self.adicionar(a)
+
+    def adicionar(self, aviso):
+        chave = (instante_aviso(aviso), self.total)
+        self.total += 1
+        chaves, avisos = self.por_turma.setdefault(aviso["turma"], ([], []))
+        # Em geral o aviso novo é o mais recente: a inserção é no fim
+        posicao = bisect_right(chaves, chave)
+        chaves.insert(posicao, chave)
+        avisos.insert(posicao, aviso)
+
+    def _anteriores(self, turma, antes):
+        # Avisos da turma anteriores à chave `antes`, do mais novo ao mais antigo
+        chaves, avisos = self.por_turma.get(turma, ((), ()))
+        fim = bisect_left(chaves, antes) if antes else len(chaves)
+        for i in range(fim - 1, -1, -1):
+            yield chaves[i], avisos[i]
+
+    def recentes(self, turmas, limite, antes=None):
+        """
+        Os `limite` avisos mais recentes das turmas, anteriores à chave `antes`.
+
+        Retorna:
+            tuple: (avisos do mais novo ao mais antigo, chave do último ou None
+                    se não houver mais avisos)
+        """
+        fontes = [self._anteriores(turma, antes) for turma in set(turmas)]
+        itens = list(islice(heapq.merge(*fontes, key=lambda item: item[0], reverse=True), limite + 1))
+        proximo = itens[limite - 1][0] if len(itens) > limite else None
+        return [aviso for _, aviso in itens[:limite]], proximo
+
+
+def indice_avisos():
+    """Retorna o índice cronológico dos avisos de avisos.json."""
+    return _derivado("avisos", [utils.AVISOS_FILE], IndiceAvisos)
+
+
+def avisos_recentes(turmas, limite=AVISOS_LIMITE_PADRAO, cursor=None):
+    """
+    Página de avisos das turmas, do mais novo ao mais antigo.
+
+    Parâmetros:
+        turmas (iterable[str]): Nomes das turmas.
+        limite (int): Máximo de avisos (até AVISOS_LIMITE_MAXIMO).
+        cursor (str, opcional): Valor "proximo" da página anterior.
+
+    Retorna:
+        dict: {"avisos": [...], "proximo": cursor da página seguinte ou None}
+    """
+    limite = max(1, min(int(limite), AVISOS_LIMITE_MAXIMO))
+    antes = None
+    if cursor:
+        instante, _, posicao = cursor.partition("-")
+        if not (instante.isdigit() and posicao.isdigit()):
+            raise ValueError("Cursor inválido.")
+        antes = (int(instante), int(posicao))
+
+    avisos, proximo = indice_avisos().recentes(turmas, limite, antes)
+    return {"avisos": avisos, "proximo": f"{proximo[0]}-{proximo[1]}" if proximo else None}
+
+
+def registrar_aviso(aviso):
+    """
+    Acrescenta um aviso (sem reescrever avisos.json) e atualiza o índice
+    no lugar.
+    """
+    _salvar_e_atualizar(
+        "avisos", utils.AVISOS_FILE,
+        lambda: utils.append_aviso(aviso),
+        lambda indice: indice.adicionar(aviso),
+    )
+
+
+# ===============================
+# Diário: aulas registradas e previstas
+# ===============================
+class IndiceAulas:
+    """
+    Índice do diário por turma: registros por id, contagem das aulas
+    registradas e número de aulas previsto para a matéria em cursos.json.
+    """
+
+    def __init__(self, diario=(), cursos=()):
+        self.previstas_por_materia = {
+            (c["nome"], m["nome"], periodo): m["aulas"]
+            for c in cursos
+            for periodo, materias in c.get("materias", {}).items()
+            for m in materias
+            if isinstance(m, dict) and "aulas" in m
+        }
+        self.por_id = {}
+        self.aulas = {}
+        self._faltantes = {}
+        for doc in diario:
+            for registro in doc.get("registros", []):
+                self.registrar(doc["turma"], registro)
+
+    def registrar(self, turma, registro):
+        self.por_id.setdefault(turma, {})[registro["id"]] = registro
+        self.aulas.setdefault(turma, Counter())[registro["aula"]] += 1
+        self._faltantes.pop(turma, None)
+
+    def editar(self, turma, registro):
+        anterior = self.por_id.get(turma, {}).get(registro["id"])
+        if anterior is None:
+            return
+        self.por_id[turma][registro["id"]] = registro
+        contagem = self.aulas[turma]
+        contagem[anterior["aula"]] -= 1
+        if contagem[anterior["aula"]] <= 0:
+            del contagem[anterior["aula"]]
+        contagem[registro["aula"]] += 1
+        self._faltantes.pop(turma, None)
+
+    def registros(self, turma):
+        """Registros da turma, na ordem em que foram lançados."""
+        return list(self.por_id.get(turma, {}).values())
+
+    def registro(self, turma, registro_id):
+        """Busca um registro da turma pelo id."""
+        return self.por_id.get(turma, {}).get(registro_id)
+
+    def registradas(self, turma):
+        """Conjunto das aulas ("Aula 1", ...) com registro no diário."""
+        return self.aulas.get(turma, Counter()).keys()
+
+    def previstas(self, turma):
+        """
+        Número de aulas previsto para a turma em cursos.json. Sem essa
+        informação, considera tantas aulas quantos registros houver.
+        """
+        curso, materia, periodo = utils.parse_turma_nome(turma)
+        total = self.previstas_por_materia.get((curso, materia, str(periodo)))
+        if total is None:
+            total = sum(self.aulas.get(turma, Counter()).values())
+        return total
+
+    def faltantes(self, turma):
+        """Aulas previstas que ainda não foram registradas."""
+        faltantes = self._faltantes.get(turma)
+        if faltantes is None:
+            registradas = self.registradas(turma)
+            faltantes = [
+                f"Aula {i}" for i in range(1, self.previstas(turma) + 1)
+                if f"Aula {i}" not in registradas
+            ]
+            self._faltantes[turma] = faltantes
+        return faltantes
+
+
+def _fontes_aulas(turma_nome):
+    # O índice da turma depende só do arquivo de diário dela e de cursos.json
+    caminho = utils.arquivo_diario(turma_nome)
+    return [caminho, utils.CURSOS_FILE] if caminho else [utils.CURSOS_FILE]
+
+
+def indice_aulas(turma_nome):
+    """
+    Retorna o índice do diário da turma (registros por id e aulas previstas).
+    Gravar no diário de outra turma não invalida este índice.
+    """
+    return _derivado(f"aulas:{turma_nome}", _fontes_aulas(turma_nome),
+                     lambda *dados: IndiceAulas(dados[:-1], dados[-1]))
+
+
+def diario_das_turmas(turmas=None):
+    """
+    Monta um IndiceAulas com o diário das turmas informadas (ou de todas),
+    para consultas que percorrem várias turmas, como as recomendações.
+    """
+    if turmas is None:
+        diario = utils.load_diario()
+    else:
+        diario = [utils.load_diario(t) for t in turmas]
+    return IndiceAulas(diario, utils.load_cursos())
+
+
+def _alterar_aula(turma_nome, salvar, atualizar):
+    # Garante o arquivo da turma antes, para que as fontes do índice não mudem na gravação
+    caminho = utils.arquivo_diario(turma_nome, criar=True)
+    _salvar_e_atualizar(f"aulas:{turma_nome}", caminho, salvar, atualizar, _fontes_aulas(turma_nome))
+
+
+def registrar_aula(turma_nome, registro):
+    """Acrescenta um registro ao diário da turma e atualiza o índice no lugar."""
+    _alterar_aula(
+        turma_nome,
+        lambda: utils.append_diario_registro(turma_nome, registro),
+        lambda indice: indice.registrar(turma_nome, registro),
+    )
+
+
+def editar_aula(turma_nome, registro):
+    """Substitui um registro do diário (pelo id) e atualiza o índice no lugar."""
+    _alterar_aula(
+        turma_nome,
+        lambda: utils.update_diario_registro(turma_nome, registro),
+        lambda indice: indice.editar(turma_nome, registro),
+    )
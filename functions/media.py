@@ -1,15 +1,98 @@
 import ctypes
 import os
+import threading
 
 # Caminho da biblioteca
-LIB_PATH = os.path.join(os.path.dirname(__file__), "../libs", "notas.dll")  # ou .dll no Windows
+LIB_DIR = os.path.join(os.path.dirname(__file__), "../libs")
+LIB_NOMES = ["notas.dll", "libnotas.so"]  # Windows / Linux
 
-# Carrega a biblioteca
-lib = ctypes.CDLL(LIB_PATH)
+# A biblioteca só é carregada no primeiro cálculo (ver carregar_biblioteca),
+# para que importar este módulo não custe nada a quem não calcula médias
+lib = None
+_lote_c = None
+_ptr = ctypes.POINTER(ctypes.c_double)
+_carregada = False
+_lock = threading.Lock()
+
+
+def _carregar_lib():
+    """Tenta carregar a biblioteca C; retorna None se nenhuma puder ser carregada."""
+    for nome in LIB_NOMES:
+        try:
+            return ctypes.CDLL(os.path.join(LIB_DIR, nome))
+        except OSError:
+            continue
+    return None
+
+
+def carregar_biblioteca():
+    """
+    Carrega a biblioteca C (uma única vez) e define os tipos das funções.
+
+    Retorna:
+        ctypes.CDLL | None: A biblioteca, ou None se não estiver disponível.
+    """
+    global lib, _lote_c, _carregada
+    if _carregada:
+        return lib
+    with _lock:
+        if _carregada:
+            return lib
+        biblioteca = _carregar_lib()
+
+        # Define tipos de entrada e saída das funções
+        if biblioteca is not None:
+            biblioteca.calcular_media.restype = ctypes.c_double
+            biblioteca.calcular_media.argtypes = [ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double]
+
+        # Versões antigas da biblioteca não têm a função em lote
+        lote = getattr(biblioteca, "calcular_medias", None) if biblioteca is not None else None
+        if lote is not None:
+            lote.restype = None
+            lote.argtypes = [_ptr, _ptr, _ptr, ctypes.c_size_t, ctypes.c_double, ctypes.c_double]
+
+        lib, _lote_c = biblioteca, lote
+        _carregada = True
+    return lib
 
-# Define tipos de entrada e saída da função
-lib.calcular_media.restype = ctypes.c_double
-lib.calcular_media.argtypes = [ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double]
 
 def calcular_media_c(np1, np2, peso_np1=0.4, peso_np2=0.6):
-    return lib.calcular_media(np1, np2, peso_np1, peso_np2)
+    biblioteca = carregar_biblioteca()
+    if biblioteca is None:
+        return np1 * peso_np1 + np2 * peso_np2
+    return biblioteca.calcular_media(np1, np2, peso_np1, peso_np2)
+
+
+def calcular_medias_lote(np1, np2, peso_np1=0.4, peso_np2=0.6, motor="auto"):
+    """
+    Calcula as médias de vários alunos de uma vez.
+
+    Parâmetros:
+        np1, np2 (sequência de float): Notas na mesma ordem dos alunos.
+        peso_np1, peso_np2 (float): Pesos de cada prova.
+        motor (str): "c" usa a função calcular_medias da biblioteca, "numpy"
+            calcula em Python vetorizado e "auto" usa C quando disponível.
+
+    Retorna:
+        numpy.ndarray: Médias, na mesma ordem das notas.
+    """
+    import numpy as np
+
+    carregar_biblioteca()
+    np1 = np.ascontiguousarray(np1, dtype=np.float64)
+    np2 = np.ascontiguousarray(np2, dtype=np.float64)
+    if np1.shape != np2.shape:
+        raise ValueError("np1 e np2 devem ter o mesmo tamanho.")
+
+    if motor == "c" and _lote_c is None:
+        raise RuntimeError("A biblioteca C carregada não tem a função calcular_medias.")
+
+    if motor in ("auto", "c") and _lote_c is not None:
+        medias = np.empty_like(np1)
+        _lote_c(
+            np1.ctypes.data_as(_ptr), np2.ctypes.data_as(_ptr), medias.ctypes.data_as(_ptr),
+            np1.size, peso_np1, peso_np2,
+        )
+        return medias
+
+    return np1 * peso_np1 + np2 * peso_np2
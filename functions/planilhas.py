@@ -0,0 +1,126 @@
+"""
+Leitura e geração de planilhas de notas (CSV e, com pandas, XLSX).
+
+Formato (uma linha por aluno; a primeira linha é o cabeçalho):
+    matricula;nome;email;NP1;NP2;media
+
+Na importação, o aluno é identificado pelo e-mail ou, na falta dele, pela
+matrícula; apenas NP1 e NP2 são lidas (a média é sempre recalculada). Uma
+célula em branco (ou coluna ausente) mantém a nota já lançada. O separador
+pode ser ";" ou "," e as notas aceitam vírgula decimal.
+"""
+
+import csv
+import io
+
+COLUNAS = ("matricula", "nome", "email", "NP1", "NP2", "media")
+NOTA_MINIMA, NOTA_MAXIMA = 0, 10
+
+
+def gerar_csv(linhas):
+    """
+    Gera o CSV em partes (uma por linha), para ser enviado em stream.
+
+    Parâmetros:
+        linhas (iterable[dict]): Linhas com as chaves de COLUNAS.
+    """
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, delimiter=";")
+
+    def parte(valores):
+        escritor.writerow(valores)
+        texto = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return texto
+
+    # BOM para que o Excel reconheça o UTF-8
+    yield "\ufeff" + parte(COLUNAS)
+    for linha in linhas:
+        yield parte([linha.get(c, "") for c in COLUNAS])
+
+
+def gerar_xlsx(linhas):
+    """Gera a planilha XLSX (bytes). Requer pandas e openpyxl."""
+    import pandas as pd
+
+    saida = io.BytesIO()
+    pd.DataFrame(list(linhas), columns=list(COLUNAS)).to_excel(saida, index=False, sheet_name="Notas")
+    return saida.getvalue()
+
+
+def ler_planilha(stream, nome_arquivo):
+    """
+    Lê uma planilha de notas enviada, linha a linha.
+
+    Parâmetros:
+        stream: Arquivo binário (ex.: FileStorage.stream).
+        nome_arquivo (str): Nome do arquivo (".xlsx" é lido com pandas).
+
+    Retorna:
+        iterator[tuple[int, dict]]: (número da linha na planilha, valores por coluna)
+    """
+    if nome_arquivo.lower().endswith(".xlsx"):
+        import pandas as pd
+
+        tabela = pd.read_excel(stream, dtype=str).fillna("")
+        for numero, linha in enumerate(tabela.to_dict("records"), start=2):
+            yield numero, {str(k).strip(): str(v).strip() for k, v in linha.items()}
+        return
+
+    texto = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    cabecalho = texto.readline()
+    delimitador = ";" if cabecalho.count(";") >= cabecalho.count(",") else ","
+    colunas = [c.strip() for c in next(csv.reader([cabecalho], delimiter=delimitador), [])]
+    for numero, valores in enumerate(csv.reader(texto, delimiter=delimitador), start=2):
+        if any(v.strip() for v in valores):
+            yield numero, dict(zip(colunas, (v.strip() for v in valores)))
+
+
+def _nota(valor):
+    if valor == "":
+        return None
+    nota = float(valor.replace(",", "."))
+    if not NOTA_MINIMA <= nota <= NOTA_MAXIMA:
+        raise ValueError
+    return nota
+
+
+def validar_notas(linhas, alunos, materia):
+    """
+    Valida as linhas importadas contra os alunos da turma.
+
+    Parâmetros:
+        linhas (iterable[tuple[int, dict]]): Saída de ler_planilha.
+        alunos (list[dict]): Alunos da turma.
+        materia (str): Matéria da turma (para as notas já lançadas).
+
+    Retorna:
+        tuple: ({email: (NP1, NP2)} das linhas válidas, [mensagens de erro])
+    """
+    por_email = {a["email"]: a for a in alunos}
+    por_matricula = {a["matricula"]: a for a in alunos if a.get("matricula")}
+
+    validas, erros = {}, []
+    for numero, linha in linhas:
+        aluno = por_email.get(linha.get("email", "")) or por_matricula.get(linha.get("matricula", ""))
+        if aluno is None:
+            erros.append(f"Linha {numero}: aluno não encontrado nesta turma.")
+            continue
+        try:
+            np1, np2 = _nota(linha.get("NP1", "")), _nota(linha.get("NP2", ""))
+        except ValueError:
+            erros.append(f"Linha {numero}: notas devem ser números entre {NOTA_MINIMA} e {NOTA_MAXIMA}.")
+            continue
+        lancadas = aluno.get("notas", {}).get(materia, {})
+        notas = (
+            lancadas.get("NP1") if np1 is None else np1,
+            lancadas.get("NP2") if np2 is None else np2,
+        )
+        if None in notas:
+            erros.append(f"Linha {numero}: NP1 e NP2 em branco só são aceitas quando já há nota lançada.")
+            continue
+        if aluno["email"] in validas:
+            erros.append(f"Linha {numero}: aluno repetido ({aluno['email']}); vale a última linha.")
+        validas[aluno["email"]] = notas
+    return validas, erros
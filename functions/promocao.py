@@ -0,0 +1,117 @@
+"""
+Promoção em lote dos alunos de um período para o seguinte.
+
+Para a turma de um curso (todos os alunos com o mesmo periodo_atual), em uma
+única passada:
+    - periodo_atual passa para o período seguinte;
+    - as matérias do novo período (cursos.json) ganham notas zeradas, sem
+      alterar notas já existentes;
+    - os alunos entram nas turmas "<curso>-<matéria>-P<novo>" e, por padrão,
+      saem das turmas do período anterior.
+
+As matrículas são atualizadas com operações de conjunto, e turmas.json e
+users.json são gravados uma vez cada. users.json é gravado por último: se a
+execução for interrompida entre as duas gravações, os alunos continuam no
+período anterior e basta executar de novo (entrar e sair das turmas não se
+repete para quem já foi movido).
+
+Uso (a partir da raiz do projeto):
+    python -m functions.promocao --curso "<nome do curso>" --periodo N [--manter-anteriores]
+"""
+
+import argparse
+import time
+
+from functions import utils
+
+
+def _nomes_materias(curso, periodo):
+    return [m["nome"] if isinstance(m, dict) else m for m in curso["materias"].get(str(periodo), [])]
+
+
+def promover_periodo(curso_nome, periodo, remover_anteriores=True):
+    """
+    Promove os alunos do curso que estão em `periodo` para `periodo + 1`.
+
+    Parâmetros:
+        curso_nome (str): Nome do curso.
+        periodo (int): Período atual dos alunos a promover.
+        remover_anteriores (bool): Se True, retira os alunos das turmas de `periodo`.
+
+    Retorna:
+        dict: {"promovidos": [e-mails], "turmas": [turmas em que entraram],
+               "sem_turma": [matérias do novo período ainda sem turma criada]}
+
+    Raises:
+        ValueError: Se o curso não existir ou `periodo` for o último do curso.
+    """
+    periodo = int(periodo)
+    curso = next((c for c in utils.load_cursos() if c["nome"] == curso_nome), None)
+    if not curso:
+        raise ValueError("Curso não encontrado.")
+    if not 1 <= periodo < int(curso["periodos"]):
+        raise ValueError(f"Não há período seguinte ao {periodo}º em {curso_nome}.")
+    novo = periodo + 1
+
+    def na_coorte(u):
+        return (u.get("role") == "student" and u.get("curso") == curso_nome
+                and str(u.get("periodo_atual")) == str(periodo))
+
+    emails = [u["email"] for u in utils.load_users() if na_coorte(u)]
+    coorte = set(emails)
+    resultado = {"promovidos": emails, "turmas": [], "sem_turma": []}
+    if not emails:
+        return resultado
+
+    # Matrículas: uma passada pelas turmas, com diferença de conjuntos
+    materias_novas = _nomes_materias(curso, novo)
+    com_turma = set()
+    with utils.alterar_json(utils.TURMAS_FILE) as turmas:
+        for turma in turmas:
+            curso_t, materia_t, periodo_t = utils.parse_turma_nome(turma["nome"])
+            if curso_t != curso_nome:
+                continue
+            if periodo_t == novo and materia_t in materias_novas:
+                ja_matriculados = set(turma["alunos"])
+                turma["alunos"].extend(e for e in emails if e not in ja_matriculados)
+                com_turma.add(materia_t)
+                resultado["turmas"].append(turma["nome"])
+            elif periodo_t == periodo and remover_anteriores:
+                turma["alunos"] = [e for e in turma["alunos"] if e not in coorte]
+    resultado["sem_turma"] = [m for m in materias_novas if m not in com_turma]
+
+    with utils.alterar_json(utils.USERS_FILE) as users:
+        for aluno in users:
+            # Confere de novo na lista atual: quem já foi promovido fica como está
+            if aluno["email"] not in coorte or not na_coorte(aluno):
+                continue
+            aluno["periodo_atual"] = novo
+            notas = aluno.setdefault("notas", {})
+            for materia in materias_novas:
+                notas.setdefault(materia, {"NP1": 0, "NP2": 0})
+
+    utils.invalidar_recomendacoes(emails)
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Promove os alunos de um período para o seguinte.")
+    parser.add_argument("--curso", required=True, help="nome do curso")
+    parser.add_argument("--periodo", type=int, required=True, help="período atual dos alunos a promover")
+    parser.add_argument("--manter-anteriores", action="store_true",
+                        help="mantém os alunos nas turmas do período anterior")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    try:
+        resultado = promover_periodo(args.curso, args.periodo, not args.manter_anteriores)
+    except ValueError as e:
+        parser.exit(1, f"{e}\n")
+    print(f"{len(resultado['promovidos'])} alunos promovidos para o {args.periodo + 1}º período "
+          f"em {time.perf_counter() - inicio:.1f} s")
+    for materia in resultado["sem_turma"]:
+        print(f"Aviso: a matéria {materia} ainda não tem turma criada.")
+
+
+if __name__ == "__main__":
+    main()
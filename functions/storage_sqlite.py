@@ -0,0 +1,445 @@
+"""
+Backend SQLite opcional para a camada de dados de functions/utils.py.
+
+Ativado com a variável de ambiente STORAGE_BACKEND=sqlite (caminho do banco
+em SQLITE_PATH, padrão "data/intec.db"). As funções load_* / save_* continuam
+as mesmas; por baixo, cada coleção vira uma tabela com índices:
+
+- usuarios: chave primária no e-mail
+- turmas: chave primária no nome, índice no e-mail do professor
+- turma_alunos: matrícula (turma, aluno), com índice pelo e-mail do aluno
+- chat_mensagens e diario: chave (turma, id); os ids são gerados por processo
+  e só são únicos dentro da turma
+- materiais e avisos: índice pela turma
+
+As buscas pontuais (get_user, get_turma, turmas_do_aluno, turmas_do_professor)
+usam esses índices diretamente, sem carregar a coleção. As operações do
+journal (ver aplicar) gravam uma única linha; save_* de uma coleção inteira
+compara com o conteúdo anterior e grava apenas as linhas que mudaram. Cada
+coleção tem um número de versão usado pelo cache de load_json.
+
+Migração a partir dos arquivos JSON existentes:
+    python -m functions.storage_sqlite migrar
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+
+SQLITE_PATH = os.getenv("SQLITE_PATH", "data/intec.db")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS usuarios (
+    email TEXT PRIMARY KEY,
+    role TEXT,
+    doc TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS turmas (
+    nome TEXT PRIMARY KEY,
+    email_professor TEXT,
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_turmas_professor ON turmas(email_professor);
+CREATE TABLE IF NOT EXISTS turma_alunos (
+    turma TEXT NOT NULL,
+    email TEXT NOT NULL,
+    PRIMARY KEY (turma, email)
+);
+CREATE INDEX IF NOT EXISTS idx_turma_alunos_email ON turma_alunos(email);
+CREATE TABLE IF NOT EXISTS cursos (
+    nome TEXT PRIMARY KEY,
+    doc TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS materiais (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    turma TEXT,
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_materiais_turma ON materiais(turma);
+CREATE TABLE IF NOT EXISTS avisos (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    turma TEXT,
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_avisos_turma ON avisos(turma);
+CREATE TABLE IF NOT EXISTS chat_mensagens (
+    id INTEGER NOT NULL,
+    turma TEXT NOT NULL,
+    doc TEXT NOT NULL,
+    PRIMARY KEY (turma, id)
+);
+CREATE TABLE IF NOT EXISTS diario (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id INTEGER NOT NULL,
+    turma TEXT NOT NULL,
+    doc TEXT NOT NULL,
+    UNIQUE (turma, id)
+);
+CREATE TABLE IF NOT EXISTS versoes (
+    chave TEXT PRIMARY KEY,
+    versao INTEGER NOT NULL
+);
+"""
+
+_local = threading.local()
+
+# Caminho do banco cujo schema já foi criado (e atualizado) neste processo:
+# as conexões das demais threads só abrem o banco e ajustam os pragmas
+_schema_pronto = None
+_schema_lock = threading.Lock()
+
+
+def _preparar_schema(con):
+    global _schema_pronto
+    with _schema_lock:
+        if _schema_pronto == SQLITE_PATH:
+            return
+        con.executescript(_SCHEMA)
+        _atualizar_chaves(con)
+        _schema_pronto = SQLITE_PATH
+
+
+def conexao():
+    """Retorna a conexão SQLite da thread atual (criando o schema se preciso)."""
+    con = getattr(_local, "con", None)
+    if con is None:
+        pasta = os.path.dirname(SQLITE_PATH)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        con = sqlite3.connect(SQLITE_PATH, timeout=30)
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute("PRAGMA synchronous=NORMAL")
+        _preparar_schema(con)
+        _local.con = con
+    return con
+
+
+# Bancos criados antes da chave (turma, id) tinham o id único no banco todo
+_TABELAS_POR_TURMA = {
+    "chat_mensagens": "INTEGER PRIMARY KEY",
+    "diario": "INTEGER UNIQUE",
+}
+
+
+def _atualizar_chaves(con):
+    """Recria as tabelas de chat e diário antigas com a chave (turma, id)."""
+    for tabela, chave_antiga in _TABELAS_POR_TURMA.items():
+        (sql,) = con.execute("SELECT sql FROM sqlite_master WHERE name = ?", (tabela,)).fetchone()
+        if chave_antiga not in sql:
+            continue
+        colunas = "seq, id, turma, doc" if tabela == "diario" else "id, turma, doc"
+        # Um único script, para que a troca aconteça em uma transação
+        con.executescript(f"""
+            BEGIN;
+            ALTER TABLE {tabela} RENAME TO {tabela}_antiga;
+            {_SCHEMA}
+            INSERT INTO {tabela} ({colunas}) SELECT {colunas} FROM {tabela}_antiga ORDER BY rowid;
+            DROP TABLE {tabela}_antiga;
+            COMMIT;
+        """)
+
+
+def _dump(doc):
+    return json.dumps(doc, ensure_ascii=False, sort_keys=True)
+
+
+def _chave_versao(colecao, turma=None):
+    return colecao if turma is None else f"{colecao}:{turma}"
+
+
+def versao(colecao, turma=None):
+    """Retorna o número de versão da coleção (ou da turma dentro da coleção)."""
+    linha = conexao().execute(
+        "SELECT versao FROM versoes WHERE chave = ?", (_chave_versao(colecao, turma),)
+    ).fetchone()
+    return linha[0] if linha else 0
+
+
+def _incrementar_versao(con, colecao, turmas=()):
+    chaves = [_chave_versao(colecao)] + [_chave_versao(colecao, t) for t in set(turmas)]
+    con.executemany(
+        "INSERT INTO versoes (chave, versao) VALUES (?, 1) "
+        "ON CONFLICT(chave) DO UPDATE SET versao = versao + 1",
+        [(c,) for c in chaves],
+    )
+
+
+# ===============================
+# Leitura
+# ===============================
+def carregar(colecao, turma=None):
+    """
+    Carrega uma coleção no mesmo formato dos arquivos JSON.
+
+    Parâmetros:
+        colecao (str): users, turmas, cursos, materiais, avisos, diario ou chat.
+        turma (str, opcional): Para diario e chat, carrega apenas essa turma.
+
+    Retorna:
+        list | dict: Lista de documentos, ou o documento da turma pedida.
+    """
+    con = conexao()
+    if colecao == "users":
+        return [json.loads(d) for (d,) in con.execute("SELECT doc FROM usuarios ORDER BY rowid")]
+    if colecao == "turmas":
+        return [json.loads(d) for (d,) in con.execute("SELECT doc FROM turmas ORDER BY rowid")]
+    if colecao == "cursos":
+        return [json.loads(d) for (d,) in con.execute("SELECT doc FROM cursos ORDER BY rowid")]
+    if colecao in ("materiais", "avisos"):
+        return [json.loads(d) for (d,) in con.execute(f"SELECT doc FROM {colecao} ORDER BY seq")]
+    if colecao == "chat":
+        if turma is None:
+            return [carregar("chat", t) for t in turmas_com("chat")]
+        linhas = con.execute("SELECT doc FROM chat_mensagens WHERE turma = ? ORDER BY id", (turma,))
+        return {"turma": turma, "mensagens": [json.loads(d) for (d,) in linhas]}
+    if colecao == "diario":
+        if turma is None:
+            return [carregar("diario", t) for t in turmas_com("diario")]
+        linhas = con.execute("SELECT doc FROM diario WHERE turma = ? ORDER BY seq", (turma,))
+        return {"turma": turma, "registros": [json.loads(d) for (d,) in linhas]}
+    raise ValueError(f"Coleção desconhecida: {colecao}")
+
+
+def turmas_com(colecao):
+    """Lista as turmas que têm mensagens (chat) ou registros (diario)."""
+    tabela = {"chat": "chat_mensagens", "diario": "diario"}[colecao]
+    return [t for (t,) in conexao().execute(
+        f"SELECT turma FROM {tabela} GROUP BY turma ORDER BY MIN(rowid)"
+    )]
+
+
+# ===============================
+# Gravação
+# ===============================
+# Coleções com chave: tabela, coluna da chave e colunas indexadas (todas com
+# o mesmo nome do campo no documento)
+_TABELAS_CHAVE = {
+    "users": ("usuarios", "email", ("role",)),
+    "turmas": ("turmas", "nome", ("email_professor",)),
+    "cursos": ("cursos", "nome", ()),
+}
+
+
+def _gravar_linhas(con, colecao, docs):
+    """Insere ou substitui os documentos de uma coleção com chave."""
+    tabela, coluna, extras = _TABELAS_CHAVE[colecao]
+    colunas = (coluna, "doc") + extras
+    marcadores = ", ".join("?" for _ in colunas)
+    atualizacoes = ", ".join(f"{c} = excluded.{c}" for c in colunas[1:])
+    con.executemany(
+        f"INSERT INTO {tabela} ({', '.join(colunas)}) VALUES ({marcadores}) "
+        f"ON CONFLICT({coluna}) DO UPDATE SET {atualizacoes}",
+        [(d[coluna], _dump(d)) + tuple(d.get(c) for c in extras) for d in docs],
+    )
+    if colecao == "turmas":
+        nomes = [(d["nome"],) for d in docs]
+        con.executemany("DELETE FROM turma_alunos WHERE turma = ?", nomes)
+        con.executemany(
+            "INSERT OR IGNORE INTO turma_alunos (turma, email) VALUES (?, ?)",
+            [(d["nome"], e) for d in docs for e in d.get("alunos", [])],
+        )
+
+
+def _sincronizar_por_chave(con, colecao, docs, anterior=None):
+    """
+    Grava a coleção alterando só o que mudou: insere chaves novas, atualiza
+    documentos diferentes e remove as ausentes.
+
+    `anterior` é o conteúdo da coleção antes da alteração (o que está em
+    cache); com ele, a comparação é feita entre os dicionários, sem ler a
+    tabela nem serializar as linhas que não mudaram. Sem ele, compara com o
+    que está gravado no banco.
+    """
+    tabela, coluna, _ = _TABELAS_CHAVE[colecao]
+    novos = {d[coluna]: d for d in docs}
+    if anterior is not None:
+        antigos = {d[coluna]: d for d in anterior}
+        alterados = [d for k, d in novos.items() if antigos.get(k) != d]
+    else:
+        antigos = dict(con.execute(f"SELECT {coluna}, doc FROM {tabela}"))
+        alterados = [d for k, d in novos.items() if antigos.get(k) != _dump(d)]
+
+    removidas = [(k,) for k in antigos.keys() - novos.keys()]
+    con.executemany(f"DELETE FROM {tabela} WHERE {coluna} = ?", removidas)
+    if colecao == "turmas":
+        con.executemany("DELETE FROM turma_alunos WHERE turma = ?", removidas)
+    _gravar_linhas(con, colecao, alterados)
+
+
+def _sincronizar_lista(con, tabela, docs):
+    """
+    Grava uma lista sem chave (materiais, avisos). O caso comum (itens novos no
+    fim da lista) só insere as linhas novas; qualquer outra mudança regrava a tabela.
+    """
+    existentes = [d for (d,) in con.execute(f"SELECT doc FROM {tabela} ORDER BY seq")]
+    novos = [_dump(d) for d in docs]
+    if novos[:len(existentes)] != existentes:
+        con.execute(f"DELETE FROM {tabela}")
+        existentes = []
+    con.executemany(
+        f"INSERT INTO {tabela} (turma, doc) VALUES (?, ?)",
+        [(d.get("turma"), n) for d, n in zip(docs[len(existentes):], novos[len(existentes):])],
+    )
+
+
+def salvar(colecao, data, turma=None, anterior=None):
+    """
+    Grava uma coleção (no formato dos arquivos JSON) em uma única transação,
+    alterando apenas as linhas que mudaram.
+
+    Parâmetros:
+        colecao (str): Nome da coleção (ver carregar).
+        data (list | dict): Conteúdo completo da coleção, ou o documento da
+            turma quando `turma` for informada (diario e chat).
+        turma (str, opcional): Turma do documento, para diario e chat.
+        anterior (list, opcional): Conteúdo antes da alteração, para users,
+            turmas e cursos (ver _sincronizar_por_chave).
+    """
+    con = conexao()
+    with con:
+        turmas_afetadas = []
+        if colecao in _TABELAS_CHAVE:
+            _sincronizar_por_chave(con, colecao, data, anterior)
+        elif colecao in ("materiais", "avisos"):
+            _sincronizar_lista(con, colecao, data)
+        elif colecao in ("chat", "diario"):
+            docs = [data] if turma is not None else data
+            tabela, campo = ("chat_mensagens", "mensagens") if colecao == "chat" else ("diario", "registros")
+            if turma is None:
+                con.execute(f"DELETE FROM {tabela}")
+            for doc in docs:
+                con.execute(f"DELETE FROM {tabela} WHERE turma = ?", (doc["turma"],))
+                con.executemany(
+                    f"INSERT INTO {tabela} (id, turma, doc) VALUES (?, ?, ?)",
+                    [(item["id"], doc["turma"], _dump(item)) for item in doc[campo]],
+                )
+                turmas_afetadas.append(doc["turma"])
+        else:
+            raise ValueError(f"Coleção desconhecida: {colecao}")
+        _incrementar_versao(con, colecao, turmas_afetadas)
+
+
+def _inserir_na_turma(con, tabela, turma, item):
+    """
+    Insere uma mensagem ou registro da turma. Os ids vêm de utils.novo_id, que
+    só é crescente dentro de um processo: se outro processo já usou o mesmo id
+    nesta turma, o item recebe o próximo id livre (alterado no próprio objeto,
+    para que o cache e quem chamou vejam o mesmo id).
+    """
+    while True:
+        try:
+            con.execute(f"INSERT INTO {tabela} (id, turma, doc) VALUES (?, ?, ?)",
+                        (item["id"], turma, _dump(item)))
+            return
+        except sqlite3.IntegrityError:
+            item["id"] += 1
+
+
+def aplicar(colecao, entrada):
+    """
+    Executa uma operação do journal (ver functions.utils._OPERACOES) como
+    gravação das linhas envolvidas, sem reescrever a coleção.
+    """
+    con = conexao()
+    op = entrada["op"]
+    with con:
+        turma = entrada.get("turma")
+        if op == "append" and colecao in _TABELAS_CHAVE:
+            turma = None
+            _gravar_linhas(con, colecao, [entrada["item"]])
+        elif op == "append":
+            turma = entrada["item"].get("turma")
+            con.execute(f"INSERT INTO {colecao} (turma, doc) VALUES (?, ?)",
+                        (turma, _dump(entrada["item"])))
+        elif op == "substituir":
+            _gravar_linhas(con, colecao, entrada["itens"])
+        elif op == "chat_mensagem":
+            _inserir_na_turma(con, "chat_mensagens", turma, entrada["mensagem"])
+        elif op == "chat_resposta":
+            linha = con.execute("SELECT doc FROM chat_mensagens WHERE turma = ? AND id = ?",
+                                (turma, entrada["msg_id"])).fetchone()
+            if linha:
+                m = json.loads(linha[0])
+                m["respostas"].append(entrada["resposta"])
+                con.execute("UPDATE chat_mensagens SET doc = ? WHERE turma = ? AND id = ?",
+                            (_dump(m), turma, m["id"]))
+        elif op == "diario_registro":
+            _inserir_na_turma(con, "diario", turma, entrada["registro"])
+        elif op == "diario_editar":
+            r = entrada["registro"]
+            con.execute("UPDATE diario SET doc = ? WHERE id = ? AND turma = ?", (_dump(r), r["id"], turma))
+        else:
+            raise ValueError(f"Operação desconhecida: {op}")
+        _incrementar_versao(con, colecao, [turma] if turma else [])
+
+
+# ===============================
+# Consultas indexadas
+# ===============================
+def get_user(email):
+    """Busca um usuário pelo e-mail usando a chave primária."""
+    linha = conexao().execute("SELECT doc FROM usuarios WHERE email = ?", (email,)).fetchone()
+    return json.loads(linha[0]) if linha else None
+
+
+def get_turma(nome):
+    """Busca uma turma pelo nome usando a chave primária."""
+    linha = conexao().execute("SELECT doc FROM turmas WHERE nome = ?", (nome,)).fetchone()
+    return json.loads(linha[0]) if linha else None
+
+
+def turmas_do_aluno(email):
+    """Lista as turmas em que o aluno está matriculado (índice turma_alunos)."""
+    linhas = conexao().execute(
+        "SELECT t.doc FROM turma_alunos a JOIN turmas t ON t.nome = a.turma "
+        "WHERE a.email = ? ORDER BY t.rowid", (email,))
+    return [json.loads(d) for (d,) in linhas]
+
+
+def turmas_do_professor(email):
+    """Lista as turmas do professor (índice por email_professor)."""
+    linhas = conexao().execute(
+        "SELECT doc FROM turmas WHERE email_professor = ? ORDER BY rowid", (email,))
+    return [json.loads(d) for (d,) in linhas]
+
+
+# ===============================
+# Migração dos arquivos JSON
+# ===============================
+def migrar():
+    """
+    Copia todos os dados dos arquivos JSON (data/*.json, data/chat/ e
+    data/diario/) para o banco SQLite. Pode ser executada novamente: o
+    conteúdo do banco é substituído pelo dos arquivos.
+    """
+    from functions import utils
+
+    backend = utils.STORAGE_BACKEND
+    utils.STORAGE_BACKEND = "json"
+    try:
+        dados = {
+            "users": utils.load_users(),
+            "turmas": utils.load_json(utils.TURMAS_FILE),
+            "cursos": utils.load_cursos(),
+            "materiais": utils.load_json(utils.MATERIAIS_FILE),
+            "avisos": utils.load_avisos(),
+            "diario": utils.load_diario(),
+            "chat": utils.load_chat_turma(),
+        }
+    finally:
+        utils.STORAGE_BACKEND = backend
+
+    for colecao, data in dados.items():
+        salvar(colecao, data)
+    utils.limpar_cache()
+    return {colecao: len(data) for colecao, data in dados.items()}
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["migrar"]:
+        print("Uso: python -m functions.storage_sqlite migrar")
+        sys.exit(1)
+    for colecao, total in migrar().items():
+        print(f"{colecao}: {total} documento(s) migrado(s) para {SQLITE_PATH}")
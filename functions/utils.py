@@ -11,9 +11,21 @@ Autor: [Seu nome]
 Data: [Data de criação ou modificação]
 """
 
+import hashlib
 import json
 import os
 import random
+import re
+import threading
+import time
+import unicodedata
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
 
 # -----------------------------
 # Caminhos globais dos arquivos
@@ -23,8 +35,306 @@ AVISOS_FILE = "data/avisos.json"
 CHAT_TURMA_FILE = "data/chat_turma.json"
 CURSOS_FILE = "data/cursos.json"
 DIARIO_FILE = "data/diario_turma.json"
+DIARIO_DIR = "data/diario"
+CHAT_DIR = "data/chat"
 UPLOAD_FOLDER = "static/materiais"
 MATERIAIS_FILE = "data/materiais.json"
+TURMAS_FILE = "data/turmas.json"
+# Tamanho máximo de cada arquivo enviado (também limita o corpo das requisições)
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_MB", "50")) * 1024 * 1024
+RECOMENDACOES_FILE = "data/recomendacoes.json"
+
+# -----------------------------
+# Backend de armazenamento
+# -----------------------------
+# "json" (padrão) grava nos arquivos acima; "sqlite" usa o banco definido em
+# SQLITE_PATH (ver functions/storage_sqlite.py), mantendo as mesmas funções.
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "json")
+_COLECOES_SQLITE = {
+    USERS_FILE: "users",
+    TURMAS_FILE: "turmas",
+    CURSOS_FILE: "cursos",
+    MATERIAIS_FILE: "materiais",
+    AVISOS_FILE: "avisos",
+}
+
+# -----------------------------
+# Journal (log de operações)
+# -----------------------------
+# Arquivos que só crescem (chat, avisos e diário) recebem cada novo registro
+# como uma linha em "<arquivo>.log". A leitura aplica o log sobre o snapshot
+# e, após COMPACTAR_APOS entradas, uma thread reescreve o snapshot e apaga o log.
+JOURNAL_SUFFIX = ".log"
+COMPACTAR_APOS = int(os.getenv("JOURNAL_COMPACTAR_APOS", "200"))
+
+# ===============================
+# Cache em memória dos arquivos JSON
+# ===============================
+# Cada entrada guarda a "assinatura" do arquivo e do seu journal (mtime e
+# tamanho) no momento da leitura. Se outro processo alterar algum deles, a
+# assinatura muda e o conteúdo é relido do disco na próxima chamada de load_json.
+_cache = {}
+_cache_lock = threading.Lock()
+_cache_stats = {"hits": 0, "misses": 0}
+
+# Geração de cada arquivo: muda sempre que o conteúdo em cache é substituído
+# ou alterado (leitura do disco, save_json ou append_json_log). Índices
+# derivados (functions/indices.py) usam esse número para saber quando se refazer.
+_geracoes = {}
+
+# Um lock de escrita por arquivo: gravações e compactações do mesmo arquivo
+# são serializadas, sem bloquear leituras ou escritas de outros arquivos.
+# É reentrante para que alterar_json possa segurá-lo entre a leitura e o save.
+# Com vários workers, o lock também trava "<arquivo>.lock" no disco; as
+# leituras do disco usam a trava compartilhada, para nunca verem o snapshot
+# novo junto com o journal que ele já contém.
+_locks_escrita = {}
+_journal_pendentes = {}
+_compactando = set()
+
+
+def _stat(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _sqlite():
+    from functions import storage_sqlite
+    return storage_sqlite
+
+
+def _colecao_sqlite(filename):
+    """
+    Retorna (coleção, turma) quando o arquivo é armazenado no SQLite, ou None.
+    Coleções particionadas por turma usam nomes no formato "sqlite:<coleção>:<turma>".
+    """
+    if STORAGE_BACKEND != "sqlite":
+        return None
+    if filename.startswith("sqlite:"):
+        _, colecao, turma = filename.split(":", 2)
+        return colecao, turma
+    colecao = _COLECOES_SQLITE.get(filename)
+    return (colecao, None) if colecao else None
+
+
+def _assinatura(filename):
+    """
+    Retorna o (mtime_ns, tamanho) do arquivo e do seu journal, ou a versão da
+    coleção quando o backend é SQLite.
+    """
+    colecao = _colecao_sqlite(filename)
+    if colecao:
+        return ("sqlite", _sqlite().versao(*colecao))
+    return (_stat(filename), _stat(filename + JOURNAL_SUFFIX))
+
+
+def _guardar_cache(filename, assinatura, data):
+    """Guarda o conteúdo no cache e avança a geração do arquivo (exige _cache_lock)."""
+    _cache[filename] = (assinatura, data)
+    _geracoes[filename] = _geracoes.get(filename, 0) + 1
+
+
+def geracao(filename):
+    """
+    Retorna a geração atual do conteúdo em cache do arquivo.
+
+    Dois valores iguais garantem que o objeto devolvido por load_json não foi
+    substituído nem alterado por funções deste módulo entre as duas consultas.
+    """
+    with _cache_lock:
+        return _geracoes.get(filename, 0)
+
+
+class _Trava:
+    def __init__(self):
+        self.local = threading.RLock()
+        self.dono = None
+        self.profundidade = 0
+        self.arquivo = None
+
+
+def _travar_arquivo(f, exclusiva):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusiva else fcntl.LOCK_SH)
+        return
+    # msvcrt não tem trava compartilhada, e LK_LOCK desiste após ~10 s
+    f.seek(0)
+    while True:
+        try:
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            pass
+
+
+def _destravar_arquivo(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def _lock_escrita(filename):
+    with _cache_lock:
+        trava = _locks_escrita.setdefault(filename, _Trava())
+    with trava.local:
+        if trava.profundidade == 0:
+            trava.dono = threading.get_ident()
+            if _colecao_sqlite(filename) is None:
+                # No SQLite as transações já isolam os processos
+                trava.arquivo = open(filename + ".lock", "a+b")
+                _travar_arquivo(trava.arquivo, exclusiva=True)
+        trava.profundidade += 1
+        try:
+            yield
+        finally:
+            trava.profundidade -= 1
+            if trava.profundidade == 0:
+                trava.dono = None
+                if trava.arquivo is not None:
+                    _destravar_arquivo(trava.arquivo)
+                    trava.arquivo.close()
+                    trava.arquivo = None
+
+
+@contextmanager
+def _lock_leitura(filename):
+    with _cache_lock:
+        trava = _locks_escrita.get(filename)
+    if trava is not None and trava.dono == threading.get_ident():
+        # Quem grava já tem a trava exclusiva
+        yield
+        return
+    with open(filename + ".lock", "a+b") as f:
+        _travar_arquivo(f, exclusiva=False)
+        try:
+            yield
+        finally:
+            _destravar_arquivo(f)
+
+
+def cache_stats():
+    """
+    Retorna os contadores do cache de leitura.
+
+    Retorna:
+        dict: {"hits": int, "misses": int, "arquivos": int}
+    """
+    with _cache_lock:
+        return {**_cache_stats, "arquivos": len(_cache)}
+
+
+def limpar_cache(filename=None):
+    """Descarta o cache de um arquivo específico ou de todos os arquivos."""
+    with _cache_lock:
+        if filename is None:
+            _cache.clear()
+        else:
+            _cache.pop(filename, None)
+
+
+# ===============================
+# Operações do journal
+# ===============================
+def _turma_doc(data, turma_nome, campo):
+    """
+    Retorna (criando se preciso) o documento {"turma", campo: []} da turma.
+    Em arquivos particionados por turma, `data` já é o próprio documento.
+    """
+    if isinstance(data, dict):
+        return data
+    doc = next((d for d in data if d["turma"] == turma_nome), None)
+    if doc is None:
+        doc = {"turma": turma_nome, campo: []}
+        data.append(doc)
+    return doc
+
+
+def _op_append(data, entrada):
+    data.append(entrada["item"])
+
+
+def _op_chat_mensagem(data, entrada):
+    _turma_doc(data, entrada["turma"], "mensagens")["mensagens"].append(entrada["mensagem"])
+
+
+def _op_chat_resposta(data, entrada):
+    doc = _turma_doc(data, entrada["turma"], "mensagens")
+    mensagem = next((m for m in doc["mensagens"] if m["id"] == entrada["msg_id"]), None)
+    if mensagem is not None:
+        mensagem["respostas"].append(entrada["resposta"])
+
+
+def _op_diario_registro(data, entrada):
+    _turma_doc(data, entrada["turma"], "registros")["registros"].append(entrada["registro"])
+
+
+def _op_diario_editar(data, entrada):
+    registros = _turma_doc(data, entrada["turma"], "registros")["registros"]
+    novo = entrada["registro"]
+    for i, r in enumerate(registros):
+        if r["id"] == novo["id"]:
+            registros[i] = novo
+            break
+
+
+def _op_substituir(data, entrada):
+    campo = entrada["campo"]
+    novos = {item[campo]: item for item in entrada["itens"]}
+    for i, item in enumerate(data):
+        if item[campo] in novos:
+            data[i] = novos[item[campo]]
+
+
+def _op_definir(data, entrada):
+    data[entrada["chave"]] = entrada["valor"]
+
+
+def _op_remover(data, entrada):
+    for chave in entrada["chaves"]:
+        data.pop(chave, None)
+
+
+def _op_invalidar(data, entrada):
+    for chave in entrada["chaves"]:
+        data[chave] = {"invalidado_em": entrada["em"]}
+
+
+_OPERACOES = {
+    "append": _op_append,
+    "substituir": _op_substituir,
+    "definir": _op_definir,
+    "remover": _op_remover,
+    "invalidar": _op_invalidar,
+    "chat_mensagem": _op_chat_mensagem,
+    "chat_resposta": _op_chat_resposta,
+    "diario_registro": _op_diario_registro,
+    "diario_editar": _op_diario_editar,
+}
+
+
+def _replay_journal(filename, data):
+    """Aplica sobre `data` as operações gravadas no journal do arquivo."""
+    caminho = filename + JOURNAL_SUFFIX
+    if not os.path.exists(caminho):
+        return 0
+    total = 0
+    with open(caminho, "r", encoding="utf-8") as f:
+        for linha in f:
+            try:
+                entrada = json.loads(linha)
+            except json.JSONDecodeError:
+                # Linha incompleta (gravação interrompida): ignora
+                continue
+            _OPERACOES[entrada["op"]](data, entrada)
+            total += 1
+    return total
+
 
 # ===============================
 # Funções genéricas de leitura e gravação
@@ -35,32 +345,204 @@ def load_json(filename):
     Caso o arquivo não exista ou esteja vazio/corrompido, cria um novo arquivo
     com uma lista vazia e retorna [].
 
+    Se houver um journal ("<arquivo>.log"), suas operações são aplicadas sobre
+    o conteúdo lido. O resultado fica em cache enquanto o mtime e o tamanho
+    do arquivo e do journal não mudarem. O objeto retornado é compartilhado
+    entre as chamadas e não deve ser alterado; para alterar o conteúdo, use
+    alterar_json.
+
     Parâmetros:
         filename (str): Caminho completo do arquivo JSON.
 
     Retorna:
         list | dict: Conteúdo do arquivo JSON ou lista vazia se o arquivo não for válido.
     """
-    if not os.path.exists(filename):
+    return load_json_com_geracao(filename)[0]
+
+
+def load_json_com_geracao(filename):
+    """
+    Igual a load_json, mas retorna também a geração do conteúdo (ver geracao),
+    lidas juntas para que correspondam ao mesmo objeto.
+
+    Retorna:
+        tuple: (conteúdo, geração)
+    """
+    colecao = _colecao_sqlite(filename)
+    if colecao is None and not os.path.exists(filename):
         with open(filename, "w", encoding="utf-8") as f:
             json.dump([], f)
-    with open(filename, "r", encoding="utf-8") as f:
-        try:
-            return json.load(f)
-        except json.JSONDecodeError:
-            return []
+
+    assinatura = _assinatura(filename)
+    with _cache_lock:
+        entrada = _cache.get(filename)
+        if entrada and entrada[0] == assinatura:
+            _cache_stats["hits"] += 1
+            return entrada[1], _geracoes[filename]
+        _cache_stats["misses"] += 1
+
+    if colecao:
+        data = _sqlite().carregar(*colecao)
+        pendentes = 0
+    else:
+        with _lock_leitura(filename):
+            assinatura = _assinatura(filename)
+            with open(filename, "r", encoding="utf-8") as f:
+                try:
+                    data = json.load(f)
+                except json.JSONDecodeError:
+                    data = []
+            pendentes = _replay_journal(filename, data)
+
+    with _cache_lock:
+        _guardar_cache(filename, assinatura, data)
+        _journal_pendentes[filename] = pendentes
+        return data, _geracoes[filename]
 
 
 def save_json(filename, data):
     """
-    Salva dados (lista ou dicionário) em formato JSON no arquivo especificado.
+    Salva dados (lista ou dicionário) em formato JSON no arquivo especificado
+    e atualiza o cache de leitura com o novo conteúdo.
+
+    A gravação é feita em um arquivo temporário renomeado ao final, e o journal
+    do arquivo (se existir) é descartado, pois o snapshot já o contém.
 
     Parâmetros:
         filename (str): Caminho do arquivo a ser salvo.
         data (list | dict): Dados a serem escritos no arquivo.
     """
-    with open(filename, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
+    colecao = _colecao_sqlite(filename)
+    if colecao:
+        with _lock_escrita(filename):
+            # O conteúdo em cache serve de base para gravar só as linhas alteradas
+            with _cache_lock:
+                entrada = _cache.get(filename)
+            anterior = None
+            if entrada and entrada[1] is not data and entrada[0] == _assinatura(filename):
+                anterior = entrada[1]
+            _sqlite().salvar(colecao[0], data, colecao[1], anterior)
+            with _cache_lock:
+                _guardar_cache(filename, _assinatura(filename), data)
+        return
+
+    with _lock_escrita(filename):
+        temporario = f"{filename}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=4, ensure_ascii=False)
+        os.replace(temporario, filename)
+        try:
+            os.remove(filename + JOURNAL_SUFFIX)
+        except FileNotFoundError:
+            pass
+        with _cache_lock:
+            _guardar_cache(filename, _assinatura(filename), data)
+            _journal_pendentes[filename] = 0
+
+
+@contextmanager
+def alterar_json(filename):
+    """
+    Abre o conteúdo do arquivo para alteração e o salva ao fim do bloco:
+
+        with alterar_json(TURMAS_FILE) as turmas:
+            turmas.append(nova_turma)
+
+    O bloco recebe uma cópia do conteúdo atual; o cache só é substituído pelo
+    save_json ao final. Se uma exceção interromper o bloco, nada é gravado e
+    o conteúdo em cache continua igual ao arquivo. Alterações do mesmo
+    arquivo são serializadas, inclusive entre processos.
+    """
+    with _lock_escrita(filename):
+        # Cópia via JSON: o conteúdo é JSON por construção, e é mais rápido que deepcopy
+        data = json.loads(json.dumps(load_json(filename)))
+        yield data
+        save_json(filename, data)
+
+
+@contextmanager
+def alterar_itens(filename, campo, chaves):
+    """
+    Como alterar_json, mas para alguns itens de uma lista com chave (por
+    exemplo, usuários pelo "email"):
+
+        with alterar_itens(USERS_FILE, "email", emails) as usuarios:
+            usuarios[email]["periodo_atual"] = 2
+
+    O bloco recebe {chave: cópia do item} para as chaves que existem; itens
+    retirados do dicionário não são gravados. Ao fim, os itens são gravados como uma operação do journal ("substituir"), com
+    custo proporcional ao número de itens e não ao tamanho do arquivo.
+    """
+    chaves = set(chaves)
+    with _lock_escrita(filename):
+        itens = {
+            item[campo]: json.loads(json.dumps(item))
+            for item in load_json(filename) if item[campo] in chaves
+        }
+        yield itens
+        if itens:
+            append_json_log(filename, "substituir", campo=campo, itens=list(itens.values()))
+
+
+def append_json_log(filename, op, **campos):
+    """
+    Registra uma operação no journal do arquivo em vez de reescrevê-lo.
+
+    O custo da gravação é proporcional ao tamanho do registro. A operação
+    também é aplicada ao conteúdo em cache, e a compactação é disparada em
+    segundo plano quando o journal passa de COMPACTAR_APOS entradas.
+
+    Parâmetros:
+        filename (str): Caminho do arquivo JSON (snapshot).
+        op (str): Nome da operação (ver _OPERACOES).
+        **campos: Dados da operação.
+    """
+    entrada = {"op": op, **campos}
+
+    colecao = _colecao_sqlite(filename)
+    if colecao:
+        # No SQLite a operação já é a gravação de uma única linha
+        with _lock_escrita(filename):
+            data = load_json(filename)
+            _sqlite().aplicar(colecao[0], entrada)
+            _OPERACOES[op](data, entrada)
+            with _cache_lock:
+                _guardar_cache(filename, _assinatura(filename), data)
+        return
+
+    linha = json.dumps(entrada, ensure_ascii=False) + "\n"
+
+    with _lock_escrita(filename):
+        # Lido com o lock: inclui o que outros processos já gravaram
+        data = load_json(filename)
+        with open(filename + JOURNAL_SUFFIX, "a", encoding="utf-8") as f:
+            f.write(linha)
+        _OPERACOES[op](data, entrada)
+        with _cache_lock:
+            _guardar_cache(filename, _assinatura(filename), data)
+            pendentes = _journal_pendentes.get(filename, 0) + 1
+            _journal_pendentes[filename] = pendentes
+            compactar = pendentes >= COMPACTAR_APOS and filename not in _compactando
+            if compactar:
+                _compactando.add(filename)
+
+    if compactar:
+        threading.Thread(target=compactar_journal, args=(filename,), daemon=True).start()
+
+
+def compactar_journal(filename):
+    """
+    Reescreve o snapshot do arquivo com o journal aplicado e apaga o journal.
+    A leitura, a gravação e a remoção acontecem com o lock do arquivo, então
+    nenhum outro processo acrescenta linhas ao journal nesse intervalo.
+    """
+    try:
+        with _lock_escrita(filename):
+            if os.path.exists(filename + JOURNAL_SUFFIX):
+                save_json(filename, load_json(filename))
+    finally:
+        with _cache_lock:
+            _compactando.discard(filename)
 
 
 # ===============================
@@ -76,9 +558,21 @@ def save_users(users):
     save_json(USERS_FILE, users)
 
 
+def load_turmas():
+    """Carrega a lista de turmas cadastradas."""
+    return load_json(TURMAS_FILE)
+
+
+def save_turmas(turmas):
+    """Salva a lista de turmas cadastradas."""
+    save_json(TURMAS_FILE, turmas)
+
+
 def get_user_by_email(email):
     """
-    Busca um usuário específico pelo e-mail.
+    Busca um usuário específico pelo e-mail, usando o índice e-mail → usuário
+    (refeito apenas quando users.json muda ou save_users é chamado). Com o
+    backend SQLite, consulta a chave primária da tabela de usuários.
 
     Parâmetros:
         email (str): Endereço de e-mail do usuário.
@@ -86,11 +580,77 @@ def get_user_by_email(email):
     Retorna:
         dict | None: Dicionário com os dados do usuário se encontrado, ou None caso contrário.
     """
-    users = load_users()
-    for u in users:
-        if u["email"] == email:
-            return u
-    return None
+    if STORAGE_BACKEND == "sqlite":
+        return _sqlite().get_user(email)
+    from functions.indices import usuarios_por_email
+    return usuarios_por_email().get(email)
+
+
+def load_materiais():
+    """Carrega a lista de materiais enviados às turmas."""
+    return load_json(MATERIAIS_FILE)
+
+
+def append_material(material):
+    """Acrescenta um material sem reescrever o arquivo de materiais."""
+    append_json_log(MATERIAIS_FILE, "append", item=material)
+
+
+class ArquivoMuitoGrande(ValueError):
+    """O arquivo enviado passa de MAX_UPLOAD_BYTES."""
+
+
+_BLOCO_UPLOAD = 64 * 1024
+
+
+def salvar_arquivo_material(stream, nome_original, limite=MAX_UPLOAD_BYTES):
+    """
+    Guarda um arquivo enviado em UPLOAD_FOLDER com o nome dado pelo hash
+    SHA-256 do conteúdo (mais a extensão original), lendo-o em blocos.
+
+    O conteúdo é primeiro apenas lido para calcular o hash: se o mesmo arquivo
+    já foi enviado (para qualquer turma), nada é gravado. Caso contrário, ele
+    é copiado em blocos para um arquivo temporário renomeado ao final.
+
+    Parâmetros:
+        stream: Arquivo aberto para leitura binária, posicionável (seek), como
+            o FileStorage.stream do Flask.
+        nome_original (str): Nome do arquivo enviado (usado para a extensão).
+        limite (int): Tamanho máximo em bytes.
+
+    Retorna:
+        dict: {"hash", "caminho" (relativo a UPLOAD_FOLDER), "tamanho", "novo"}
+
+    Raises:
+        ArquivoMuitoGrande: Se o arquivo passar de `limite`.
+    """
+    sha = hashlib.sha256()
+    tamanho = 0
+    for bloco in iter(lambda: stream.read(_BLOCO_UPLOAD), b""):
+        tamanho += len(bloco)
+        if tamanho > limite:
+            raise ArquivoMuitoGrande(f"O arquivo passa do limite de {limite // (1024 * 1024)} MB.")
+        sha.update(bloco)
+
+    extensao = re.sub(r"[^a-z0-9.]", "", os.path.splitext(nome_original)[1].lower())[:10]
+    caminho = sha.hexdigest() + extensao
+    destino = os.path.join(UPLOAD_FOLDER, caminho)
+    novo = not os.path.exists(destino)
+
+    if novo:
+        os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+        temporario = f"{destino}.{os.getpid()}.{threading.get_ident()}.tmp"
+        stream.seek(0)
+        try:
+            with open(temporario, "wb") as f:
+                for bloco in iter(lambda: stream.read(_BLOCO_UPLOAD), b""):
+                    f.write(bloco)
+            os.replace(temporario, destino)
+        finally:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+
+    return {"hash": sha.hexdigest(), "caminho": caminho, "tamanho": tamanho, "novo": novo}
 
 
 def load_avisos():
@@ -103,14 +663,179 @@ def save_avisos(avisos):
     save_json(AVISOS_FILE, avisos)
 
 
-def load_chat_turma():
-    """Carrega o histórico de chat das turmas."""
-    return load_json(CHAT_TURMA_FILE)
+def append_aviso(aviso):
+    """Acrescenta um aviso sem reescrever o arquivo de avisos."""
+    append_json_log(AVISOS_FILE, "append", item=aviso)
+
+
+# -----------------------------
+# Armazenamento particionado por turma
+# -----------------------------
+# Cada turma tem seu próprio arquivo dentro do diretório da coleção, e um
+# manifesto (manifest.json) associa o nome da turma ao nome do arquivo.
+# Assim, gravar na turma A não lê nem reescreve o histórico da turma B.
+
+
+def _nome_shard(turma_nome):
+    """Gera um nome de arquivo seguro e único para a turma."""
+    ascii_nome = unicodedata.normalize("NFKD", turma_nome).encode("ascii", "ignore").decode("ascii")
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", ascii_nome).strip("_")[:60]
+    sufixo = hashlib.sha1(turma_nome.encode("utf-8")).hexdigest()[:8]
+    return f"{slug}-{sufixo}.json"
+
+
+def _manifesto(diretorio, legado, campo):
+    """
+    Carrega o manifesto {turma: arquivo} do diretório particionado.
+
+    Na primeira execução, os dados do arquivo único antigo (`legado`) são
+    distribuídos em um arquivo por turma. O arquivo antigo não é apagado.
+    """
+    caminho = os.path.join(diretorio, "manifest.json")
+    if os.path.exists(caminho):
+        return load_json(caminho)
+
+    os.makedirs(diretorio, exist_ok=True)
+    with _lock_escrita(caminho):
+        if os.path.exists(caminho):
+            return load_json(caminho)
+        manifesto = {}
+        if os.path.exists(legado):
+            for doc in load_json(legado):
+                arquivo = _nome_shard(doc["turma"])
+                save_json(os.path.join(diretorio, arquivo), {"turma": doc["turma"], campo: doc.get(campo, [])})
+                manifesto[doc["turma"]] = arquivo
+        save_json(caminho, manifesto)
+        return manifesto
+
+
+def _shard(diretorio, legado, campo, turma_nome, criar=False):
+    """
+    Retorna o caminho do arquivo da turma, ou None se a turma ainda não tiver
+    arquivo e `criar` for False.
+    """
+    if STORAGE_BACKEND == "sqlite":
+        return f"sqlite:{os.path.basename(diretorio)}:{turma_nome}"
+
+    manifesto = _manifesto(diretorio, legado, campo)
+    arquivo = manifesto.get(turma_nome)
+    if arquivo is None:
+        if not criar:
+            return None
+        with alterar_json(os.path.join(diretorio, "manifest.json")) as manifesto:
+            arquivo = manifesto.get(turma_nome)
+            if arquivo is None:
+                arquivo = _nome_shard(turma_nome)
+                caminho = os.path.join(diretorio, arquivo)
+                # O nome vem da turma: se o arquivo já existe (criado antes de
+                # uma falha ao gravar o manifesto), não é sobrescrito, e o
+                # journal dele é preservado
+                if not os.path.exists(caminho):
+                    save_json(caminho, {"turma": turma_nome, campo: []})
+                manifesto[turma_nome] = arquivo
+    return os.path.join(diretorio, arquivo)
+
+
+def _load_particionado(diretorio, legado, campo, turma_nome=None):
+    if turma_nome is None and STORAGE_BACKEND == "sqlite":
+        turmas = _sqlite().turmas_com(os.path.basename(diretorio))
+        return [load_json(_shard(diretorio, legado, campo, t)) for t in turmas]
+    if turma_nome is None:
+        manifesto = _manifesto(diretorio, legado, campo)
+        return [load_json(os.path.join(diretorio, arquivo)) for arquivo in manifesto.values()]
+    caminho = _shard(diretorio, legado, campo, turma_nome)
+    if caminho is None:
+        return {"turma": turma_nome, campo: []}
+    return load_json(caminho)
+
+
+def _save_particionado(diretorio, legado, campo, dados):
+    for doc in ([dados] if isinstance(dados, dict) else dados):
+        save_json(_shard(diretorio, legado, campo, doc["turma"], criar=True), doc)
+
+
+def load_chat_turma(turma_nome=None):
+    """
+    Carrega o histórico de chat das turmas.
+
+    Parâmetros:
+        turma_nome (str, opcional): Se informado, carrega apenas o chat dessa
+            turma, sem ler o arquivo das demais.
+
+    Retorna:
+        list | dict: Lista com o chat de todas as turmas, ou o documento
+                     {"turma", "mensagens"} da turma pedida.
+    """
+    return _load_particionado(CHAT_DIR, CHAT_TURMA_FILE, "mensagens", turma_nome)
 
 
 def save_chat_turma(chat):
-    """Salva o histórico de chat das turmas."""
-    save_json(CHAT_TURMA_FILE, chat)
+    """
+    Salva o histórico de chat. Aceita a lista de todas as turmas ou o
+    documento {"turma", "mensagens"} de uma única turma.
+    """
+    _save_particionado(CHAT_DIR, CHAT_TURMA_FILE, "mensagens", chat)
+
+
+def append_chat_mensagem(turma_nome, mensagem):
+    """Acrescenta uma mensagem ao chat da turma (criando o chat se preciso)."""
+    caminho = _shard(CHAT_DIR, CHAT_TURMA_FILE, "mensagens", turma_nome, criar=True)
+    append_json_log(caminho, "chat_mensagem", turma=turma_nome, mensagem=mensagem)
+
+
+def append_chat_resposta(turma_nome, msg_id, resposta):
+    """Acrescenta uma resposta à mensagem `msg_id` do chat da turma."""
+    caminho = _shard(CHAT_DIR, CHAT_TURMA_FILE, "mensagens", turma_nome, criar=True)
+    append_json_log(caminho, "chat_resposta", turma=turma_nome, msg_id=msg_id, resposta=resposta)
+
+
+def versao_chat(turma_chat):
+    """
+    Calcula a versão do chat de uma turma.
+
+    Mensagens e respostas recebem ids crescentes (ver novo_id), então o maior
+    id visto funciona como cursor para buscas incrementais.
+
+    Parâmetros:
+        turma_chat (dict): Documento {"turma", "mensagens"} da turma.
+
+    Retorna:
+        tuple: (cursor, total) onde cursor é o maior id de mensagem ou resposta
+               e total é a quantidade de mensagens mais respostas.
+    """
+    cursor = 0
+    total = 0
+    for m in turma_chat["mensagens"]:
+        cursor = max(cursor, m["id"])
+        total += 1 + len(m["respostas"])
+        for r in m["respostas"]:
+            cursor = max(cursor, r.get("id", 0))
+    return cursor, total
+
+
+def chat_desde(turma_chat, since):
+    """
+    Retorna apenas o que mudou no chat da turma depois do cursor `since`.
+
+    Mensagens novas vêm completas. Mensagens antigas que receberam respostas
+    novas vêm apenas com essas respostas, para o cliente mesclar pelo id.
+
+    Parâmetros:
+        turma_chat (dict): Documento {"turma", "mensagens"} da turma.
+        since (int): Cursor retornado pela busca anterior.
+
+    Retorna:
+        list: Mensagens (completas ou parciais) posteriores ao cursor.
+    """
+    novas = []
+    for m in turma_chat["mensagens"]:
+        if m["id"] > since:
+            novas.append(m)
+            continue
+        respostas = [r for r in m["respostas"] if r.get("id", 0) > since]
+        if respostas:
+            novas.append({**m, "respostas": respostas})
+    return novas
 
 
 def load_cursos():
@@ -123,19 +848,133 @@ def save_cursos(cursos):
     save_json(CURSOS_FILE, cursos)
 
 
-def load_diario():
-    """Carrega o diário de classe (registro de notas e presenças)."""
-    return load_json(DIARIO_FILE)
+def load_diario(turma_nome=None):
+    """
+    Carrega o diário de classe (registros das aulas), particionado por turma
+    em DIARIO_DIR como o chat.
+
+    Parâmetros:
+        turma_nome (str, opcional): Se informado, carrega apenas o diário
+            dessa turma, sem ler o arquivo das demais.
+
+    Retorna:
+        list | dict: Lista com o diário de todas as turmas, ou o documento
+                     {"turma", "registros"} da turma pedida.
+    """
+    return _load_particionado(DIARIO_DIR, DIARIO_FILE, "registros", turma_nome)
 
 
 def save_diario(diario):
-    """Salva o diário de classe (registro de notas e presenças)."""
-    save_json(DIARIO_FILE, diario)
+    """
+    Salva o diário de classe. Aceita a lista de todas as turmas ou o
+    documento {"turma", "registros"} de uma única turma.
+    """
+    _save_particionado(DIARIO_DIR, DIARIO_FILE, "registros", diario)
+
+
+def arquivo_diario(turma_nome, criar=False):
+    """
+    Caminho do arquivo de diário da turma (None se ainda não existir e
+    `criar` for False).
+    """
+    return _shard(DIARIO_DIR, DIARIO_FILE, "registros", turma_nome, criar)
+
+
+def append_diario_registro(turma_nome, registro):
+    """Acrescenta um registro de aula ao diário da turma."""
+    append_json_log(arquivo_diario(turma_nome, criar=True), "diario_registro",
+                    turma=turma_nome, registro=registro)
+
+
+def update_diario_registro(turma_nome, registro):
+    """Substitui o registro de mesmo id no diário da turma."""
+    append_json_log(arquivo_diario(turma_nome, criar=True), "diario_editar",
+                    turma=turma_nome, registro=registro)
+
+
+# Recomendações pré-calculadas: {email: {"materiais", "estudo", "gerado_em"}}.
+# É um cache derivado dos demais arquivos; ver ai_module/batch_recommendation.py.
+def load_recomendacoes():
+    """Carrega as recomendações pré-calculadas, indexadas pelo e-mail do aluno."""
+    recomendacoes = load_json(RECOMENDACOES_FILE)
+    if not isinstance(recomendacoes, dict):
+        # Arquivo recém-criado por load_json (lista vazia)
+        recomendacoes = {}
+        save_json(RECOMENDACOES_FILE, recomendacoes)
+    return recomendacoes
+
+
+def recomendacao_valida(registro):
+    """Indica se o registro gravado é uma recomendação (e não uma invalidação)."""
+    return registro is not None and "invalidado_em" not in registro
+
+
+def _invalidada_desde(registro, inicio):
+    return registro is not None and registro.get("invalidado_em", float("-inf")) >= inicio
+
+
+def mesclar_recomendacoes(recomendacoes, calculadas_desde):
+    """
+    Substitui as recomendações pré-calculadas pelas de um lote, exceto as dos
+    alunos invalidados depois de `calculadas_desde` (o início do cálculo):
+    essas continuam invalidadas e serão recalculadas no próximo acesso.
+    """
+    with _lock_escrita(RECOMENDACOES_FILE):
+        salvas = load_recomendacoes()
+        novas = {e: r for e, r in salvas.items() if _invalidada_desde(r, calculadas_desde)}
+        novas.update((e, r) for e, r in recomendacoes.items() if e not in novas)
+        save_json(RECOMENDACOES_FILE, novas)
+
+
+def salvar_recomendacao(email, recomendacao, calculada_desde):
+    """
+    Grava as recomendações de um aluno sem reescrever o arquivo, a menos que
+    o aluno tenha sido invalidado depois de `calculada_desde`.
+
+    Retorna:
+        bool: True se a recomendação foi gravada.
+    """
+    with _lock_escrita(RECOMENDACOES_FILE):
+        if _invalidada_desde(load_recomendacoes().get(email), calculada_desde):
+            return False
+        append_json_log(RECOMENDACOES_FILE, "definir", chave=email, valor=recomendacao)
+    return True
+
+
+def invalidar_recomendacoes(emails):
+    """
+    Descarta as recomendações dos alunos informados; elas serão recalculadas
+    no próximo acesso ou na próxima execução do lote.
+
+    A invalidação é registrada mesmo para alunos sem recomendação gravada,
+    para que um cálculo iniciado antes dela não seja gravado depois.
+    """
+    emails = list(emails)
+    if emails:
+        load_recomendacoes()
+        append_json_log(RECOMENDACOES_FILE, "invalidar", chaves=emails, em=time.time())
 
 
 # ===============================
 # Funções auxiliares de lógica acadêmica
 # ===============================
+_ultimo_id = 0
+_id_lock = threading.Lock()
+
+
+def novo_id():
+    """
+    Gera um id numérico baseado no horário atual (em milissegundos).
+
+    Ids gerados no mesmo processo são estritamente crescentes, mesmo quando
+    duas chamadas caem no mesmo milissegundo.
+    """
+    global _ultimo_id
+    with _id_lock:
+        _ultimo_id = max(int(time.time() * 1000), _ultimo_id + 1)
+        return _ultimo_id
+
+
 def gerar_matricula(curso_nome, periodo):
     """
     Gera um código de matrícula único com base no curso e período informados.
@@ -154,6 +993,23 @@ def gerar_matricula(curso_nome, periodo):
     return f"{prefixo}{int(periodo)}{numero_random}"
 
 
+def normalizar_texto(texto):
+    """
+    Normaliza um texto para buscas: minúsculas e sem acentos.
+
+    Exemplo:
+        Entrada: "João Conceição"
+        Saída: "joao conceicao"
+    """
+    sem_acentos = unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode("ascii")
+    return sem_acentos.lower()
+
+
+def tokenizar(texto):
+    """Divide um texto normalizado (ver normalizar_texto) em palavras alfanuméricas."""
+    return re.findall(r"[a-z0-9]+", normalizar_texto(texto))
+
+
 def parse_turma_nome(turma_nome):
     """
     Analisa o nome completo de uma turma e extrai o curso, a matéria e o período.
@@ -1,7 +1,17 @@
 // notas.c
 #include <stdio.h>
+#include <stddef.h>
 
 // Função que calcula média ponderada de NP1 e NP2
 double calcular_media(double np1, double np2, double peso_np1, double peso_np2) {
     return np1 * peso_np1 + np2 * peso_np2;
 }
+
+// Calcula as médias de uma turma inteira em uma única chamada.
+// np1, np2 e medias são vetores contíguos com n posições.
+void calcular_medias(const double *np1, const double *np2, double *medias, size_t n,
+                     double peso_np1, double peso_np2) {
+    for (size_t i = 0; i < n; i++) {
+        medias[i] = np1[i] * peso_np1 + np2[i] * peso_np2;
+    }
+}
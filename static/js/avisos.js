@@ -0,0 +1,75 @@
+// Botão "Carregar mais avisos": busca a página seguinte em /avisos e
+// acrescenta os itens à lista indicada em data-lista.
+//
+// Atributos do botão:
+//   data-url       URL de /avisos (com a turma, se for o caso)
+//   data-cursor    valor "proximo" da página atual
+//   data-lista     id do <ul> dos avisos
+//   data-layout    "cartao" (título em destaque) ou "linha" (título - data)
+//   data-mostrar-turma   presente para exibir a turma de cada aviso
+function criarItemAviso(aviso, layout, mostrarTurma) {
+  const li = document.createElement("li");
+  li.className = "list-group-item";
+
+  if (layout === "linha") {
+    const titulo = document.createElement("strong");
+    titulo.textContent = aviso.titulo;
+    const data = document.createElement("span");
+    data.className = "text-muted";
+    data.textContent = aviso.data;
+    li.append(titulo, " - ", data);
+  } else {
+    li.classList.add("flex-column", "align-items-start");
+    const topo = document.createElement("div");
+    topo.className = "d-flex w-100 justify-content-between";
+    const titulo = document.createElement("h5");
+    titulo.textContent = aviso.titulo;
+    const data = document.createElement("small");
+    data.textContent = aviso.data;
+    topo.append(titulo, data);
+    li.append(topo);
+  }
+
+  const mensagem = document.createElement("p");
+  mensagem.textContent = aviso.mensagem;
+  li.append(mensagem);
+
+  if (mostrarTurma) {
+    const turma = document.createElement("small");
+    turma.textContent = `Turma: ${aviso.turma}`;
+    li.append(turma);
+  }
+  return li;
+}
+
+document.addEventListener("DOMContentLoaded", () => {
+  document.querySelectorAll("[data-avisos-mais]").forEach((botao) => {
+    botao.addEventListener("click", async () => {
+      const lista = document.getElementById(botao.dataset.lista);
+      const url = new URL(botao.dataset.url, window.location.origin);
+      url.searchParams.set("cursor", botao.dataset.cursor);
+
+      botao.disabled = true;
+      try {
+        const res = await fetch(url);
+        if (!res.ok) throw new Error(res.status);
+        const pagina = await res.json();
+
+        pagina.avisos.forEach((aviso) => {
+          lista.append(
+            criarItemAviso(aviso, botao.dataset.layout, "mostrarTurma" in botao.dataset)
+          );
+        });
+        if (pagina.proximo) {
+          botao.dataset.cursor = pagina.proximo;
+          botao.disabled = false;
+        } else {
+          botao.remove();
+        }
+      } catch (erro) {
+        console.error("Erro ao carregar avisos:", erro);
+        botao.disabled = false;
+      }
+    });
+  });
+});
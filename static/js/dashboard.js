@@ -11,10 +11,10 @@ document.addEventListener("DOMContentLoaded", () => {
       }
 
       const res = await fetch(`/buscar_alunos?q=${encodeURIComponent(q)}`);
-      const alunos = await res.json();
+      const data = await res.json();
 
-      results.innerHTML = alunos
-        .map(a => `<li>${a.nome} (${a.idade} anos)</li>`)
+      results.innerHTML = data.alunos
+        .map(a => `<li>${a.fullname} (${a.email})</li>`)
         .join("");
     });
   }